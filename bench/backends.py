@@ -0,0 +1,143 @@
+"""
+Сравнение бэкендов модели эмбеддингов с fp32-эталоном.
+
+    python -m bench.backends --backends torch-int8 onnx --threads 4
+    python -m bench.backends --tolerance 0.01 --output bench/results/backends.json
+
+Для каждого бэкенда считается зональная релевантность на корпусе bench/corpus.py
+и максимальное отклонение оценок от бэкенда torch (fp32), а также пропускная
+способность кодирования в предложениях в секунду. Код возврата 1, если
+отклонение какого-либо бэкенда превышает допуск.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from bench.corpus import SIZES, load_corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+EXCLUDE_TAGS = ["script", "style", "noscript", "footer", "header", "nav"]
+
+
+def throughput(model, texts, repeat):
+    """Лучшее из repeat время кодирования texts в предложениях в секунду"""
+    model.encode(texts[:8])  # прогрев
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        model.encode(texts, batch_size=64)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def evaluate(backend, threads, model_name, docs, texts, repeat):
+    from core.semantic_analyzer import ZONES, compare_zones, load_model
+
+    started = time.perf_counter()
+    model = load_model(backend, threads, model_name)
+    load_s = time.perf_counter() - started
+
+    my_doc, competitors = docs[0], docs[1:]
+    scores = compare_zones(my_doc, competitors, ZONES, model)
+    return {
+        "load_s": load_s,
+        "sentences_per_s": throughput(model, texts, repeat),
+        "zone_relevance": scores,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--backends", nargs="+", default=["torch-int8", "onnx"], help="кроме torch"
+    )
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--model")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"]
+    )
+    parser.add_argument("--pages-per-size", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    # Кэш эмбеддингов подменил бы результат бэкенда сохранёнными векторами
+    os.environ["TEXTMIND_EMBEDDING_CACHE_MB"] = "0"
+
+    from core.parser import build_url_data
+    from core.semantic_analyzer import MODEL_NAME, ZONES, collect_texts, normalize_text
+
+    model_name = args.model or MODEL_NAME
+    docs = [
+        build_url_data(p.url, p.html, EXCLUDE_TAGS)
+        for p in load_corpus(args.sizes, args.pages_per_size)
+    ]
+    texts = list(
+        dict.fromkeys(
+            normalize_text(t) for t in collect_texts(docs, ZONES, items=True) if t
+        )
+    )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "model": model_name,
+            "threads": args.threads,
+            "tolerance": args.tolerance,
+            "sentences": len(texts),
+        },
+        "backends": {},
+    }
+    baseline = evaluate("torch", args.threads, model_name, docs, texts, args.repeat)
+    report["backends"]["torch"] = baseline
+
+    failed = []
+    for backend in args.backends:
+        try:
+            result = evaluate(
+                backend, args.threads, model_name, docs, texts, args.repeat
+            )
+        except ImportError as e:
+            print(f"{backend}: пропущен, не установлена зависимость ({e})")
+            continue
+        deviation = max(
+            (
+                abs(result["zone_relevance"][zone] - score)
+                for zone, score in baseline["zone_relevance"].items()
+                if zone in result["zone_relevance"]
+            ),
+            default=0.0,
+        )
+        result["max_deviation"] = deviation
+        result["speedup"] = result["sentences_per_s"] / baseline["sentences_per_s"]
+        result["within_tolerance"] = deviation <= args.tolerance
+        if not result["within_tolerance"]:
+            failed.append(backend)
+        report["backends"][backend] = result
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-backends.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'бэкенд':<12} {'предл./с':>10} {'ускорение':>10} {'отклонение':>11}")
+    for backend, result in report["backends"].items():
+        print(
+            f"{backend:<12} {result['sentences_per_s']:10.1f} "
+            f"{result.get('speedup', 1.0):9.2f}x {result.get('max_deviation', 0.0):11.4f}"
+        )
+    print(f"Результаты сохранены в {output}")
+    if failed:
+        print(f"Отклонение больше {args.tolerance}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Сравнение двух прогонов бенчмарка.
+
+    python -m bench.compare bench/results/before.json bench/results/after.json
+"""
+
+import argparse
+import json
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение прогонов бенчмарка")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args(argv)
+
+    base = load(args.baseline)["stages"]
+    cand = load(args.candidate)["stages"]
+
+    print(f"{'стадия':<18} {'было, ms':>10} {'стало, ms':>10} {'ускорение':>10}")
+    for name in base:
+        if name not in cand:
+            continue
+        before = base[name]["best_s"] * 1000
+        after = cand[name]["best_s"] * 1000
+        speedup = before / after if after else float("inf")
+        print(f"{name:<18} {before:10.1f} {after:10.1f} {speedup:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Корпус HTML-страниц для бенчмарков.
+
+Сохранённые страницы лежат в bench/fixtures/*.html, страницы разных размеров
+генерируются детерминированно из сида, чтобы прогоны были сравнимы между собой.
+"""
+
+import os
+import random
+import zlib
+from dataclasses import dataclass
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Примерный размер HTML в байтах
+SIZES = {
+    "small": 20_000,
+    "medium": 200_000,
+    "large": 2_000_000,
+}
+
+VOCABULARY = (
+    "диван угловой прямой купить цена доставка москва недорого каталог отзывы "
+    "механизм еврокнижка дельфин аккордеон обивка велюр рогожка экокожа спальное "
+    "место размер гарантия фабрика сборка скидка распродажа модель кресло кровать "
+    "матрас ортопедический наполнитель пружинный блок каркас массив ткань цвет "
+    "серый бежевый зелёный гостиная спальня детская офис заказ оплата рассрочка"
+).split()
+NAV_LINKS = ["Главная", "Каталог", "Доставка и оплата", "Контакты", "Распродажа"]
+
+
+@dataclass
+class Page:
+    name: str
+    url: str
+    html: str
+
+    @property
+    def size(self):
+        return len(self.html.encode("utf-8"))
+
+
+def _sentence(rng, n_min=6, n_max=18):
+    words = rng.choices(VOCABULARY, k=rng.randint(n_min, n_max))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_page(size, seed=0):
+    """Страница категории интернет-магазина размером около size байт"""
+    rng = random.Random(seed)
+    nav = "".join(f'<a href="/{i}/">{t}</a>' for i, t in enumerate(NAV_LINKS))
+    head = (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{_sentence(rng, 4, 8)}</title>"
+        "<script>var tracking = {};</script></head><body>"
+        f"<header><nav>{nav}</nav></header><main><div class='content'>"
+        f"<h1>{_sentence(rng, 2, 5)}</h1>"
+    )
+    tail = (
+        f"</div></main><footer><ul><li>{NAV_LINKS[0]}</li><li>{NAV_LINKS[3]}</li>"
+        "</ul></footer></body></html>"
+    )
+
+    blocks = []
+    total = len(head) + len(tail)
+    while total < size:
+        kind = rng.random()
+        if kind < 0.15:
+            block = f"<h2>{_sentence(rng, 2, 6)}</h2>"
+        elif kind < 0.25:
+            block = f"<h3>{_sentence(rng, 2, 6)}</h3>"
+        elif kind < 0.4:
+            items = "".join(f"<li>{_sentence(rng, 3, 10)}</li>" for _ in range(5))
+            block = f"<ul>{items}</ul>"
+        elif kind < 0.5:
+            rows = "".join(
+                "<tr>"
+                + "".join(f"<td>{rng.choice(VOCABULARY)}</td>" for _ in range(4))
+                + "</tr>"
+                for _ in range(6)
+            )
+            block = f"<table>{rows}</table>"
+        elif kind < 0.6:
+            links = "".join(
+                f'<a href="/p/{rng.randint(1, 10**6)}/">{_sentence(rng, 2, 4)}</a> '
+                for _ in range(8)
+            )
+            block = f"<div class='links'>{links}</div>"
+        else:
+            inner = "".join(f"<p>{_sentence(rng)}</p>" for _ in range(3))
+            block = f"<section><div><div>{inner}</div></div></section>"
+        blocks.append(block)
+        total += len(block.encode("utf-8"))
+
+    return head + "".join(blocks) + tail
+
+
+def load_corpus(sizes=("small", "medium", "large"), pages_per_size=3):
+    """Сохранённые фикстуры плюс сгенерированные страницы указанных размеров"""
+    pages = []
+    if os.path.isdir(FIXTURES_DIR):
+        for name in sorted(os.listdir(FIXTURES_DIR)):
+            if name.endswith(".html"):
+                with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                    html = f.read()
+                pages.append(Page(name, f"https://example.com/{name[:-5]}/", html))
+
+    for size_name in sizes:
+        for i in range(pages_per_size):
+            seed = zlib.crc32(f"{size_name}-{i}".encode())
+            html = generate_page(SIZES[size_name], seed=seed)
+            url = f"https://shop{i}.example.com/catalog/{size_name}-{i}/"
+            pages.append(Page(f"{size_name}-{i}", url, html))
+    return pages
@@ -0,0 +1,239 @@
+"""
+Офлайн-бенчмарк стадий анализа.
+
+    python -m bench.run --encoder stub --sizes small medium --repeat 3
+    python -m bench.run --encoder minilm --output bench/results/minilm.json
+
+Сеть не нужна: страницы берутся из bench/corpus.py, LLM заменяется локальной
+заглушкой, модель — реальной MiniLM или детерминированным StubEncoder.
+Результаты (время, пропускная способность, пиковая память по стадиям)
+сохраняются в JSON для сравнения прогонов через bench.compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from bench.corpus import SIZES, load_corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+EXCLUDE_TAGS = ["script", "style", "noscript", "footer", "header", "nav"]
+KEYWORDS = ["угловой диван купить", "диван еврокнижка", "диван с доставкой москва"]
+
+
+def measure(fn, repeat):
+    """
+    Запускает fn repeat раз для замера времени (лучший и средний прогон) и ещё
+    раз под tracemalloc для пика памяти: трассировка заметно замедляет код.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stats = {
+        "best_s": min(timings),
+        "mean_s": sum(timings) / len(timings),
+        "peak_python_mb": peak / 2**20,
+        # maxrss учитывает и память torch, которую tracemalloc не видит (Linux: КБ)
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    return result, stats
+
+
+def concurrent_analyses(model, my_doc, competitors, concurrency):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from core.semantic_analyzer import ZONES, compare_zones
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [
+            pool.submit(compare_zones, my_doc, competitors, ZONES, model)
+            for _ in range(concurrency)
+        ]
+        return [f.result() for f in futures]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+def setup(encoder, llm_latency, embedding_cache):
+    # Кэш эмбеддингов по умолчанию выключен, иначе повторные прогоны мерят кэш
+    if not embedding_cache:
+        os.environ["TEXTMIND_EMBEDDING_CACHE_MB"] = "0"
+    # Кэш LLM выключен всегда: стадия llm мерит заглушку, а не поиск в SQLite,
+    # и её ответы не попадают в пользовательский llm.sqlite
+    os.environ["TEXTMIND_LLM_CACHE_MB"] = "0"
+
+    from bench.stubs import FakeLLMClient, StubEncoder
+    from core import registry
+
+    registry.register("openai_client", lambda: FakeLLMClient(llm_latency), replace=True)
+    if encoder == "stub":
+        registry.register("embedding_model", StubEncoder, replace=True)
+
+    from core.semantic_analyzer import get_model
+
+    return get_model()
+
+
+def run(args):
+    model = setup(args.encoder, args.llm_latency, args.embedding_cache)
+
+    from core.ai_solver import analyze_results
+    from core.parser import build_url_data, parse_documents
+    from core.semantic_analyzer import ZONES, compare_zones, find_semantic_gaps
+
+    pages = load_corpus(args.sizes, args.pages_per_size)
+    total_bytes = sum(p.size for p in pages)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "encoder": args.encoder,
+            "embedding_cache": args.embedding_cache,
+            "repeat": args.repeat,
+            "pages": len(pages),
+            "bytes": total_bytes,
+            "sizes": {name: SIZES[name] for name in args.sizes},
+        },
+        "stages": {},
+    }
+    stages = report["stages"]
+
+    # Парсинг HTML
+    docs, stats = measure(
+        lambda: [build_url_data(p.url, p.html, EXCLUDE_TAGS) for p in pages],
+        args.repeat,
+    )
+    stats["pages_per_s"] = len(pages) / stats["best_s"]
+    stats["mb_per_s"] = total_bytes / 2**20 / stats["best_s"]
+    stages["parse"] = stats
+
+    for size_name in args.sizes:
+        subset = [p for p in pages if p.name.startswith(size_name + "-")]
+        _, stats = measure(
+            lambda: [build_url_data(p.url, p.html, EXCLUDE_TAGS) for p in subset],
+            args.repeat,
+        )
+        stats["pages_per_s"] = len(subset) / stats["best_s"]
+        stages[f"parse_{size_name}"] = stats
+
+    # Тот же разбор в пуле процессов (первый прогон прогревает пул)
+    html_pages = [(p.url, p.html) for p in pages]
+    parse_documents(html_pages, EXCLUDE_TAGS, args.parse_workers)
+    _, stats = measure(
+        lambda: parse_documents(html_pages, EXCLUDE_TAGS, args.parse_workers),
+        args.repeat,
+    )
+    stats["workers"] = args.parse_workers
+    stats["pages_per_s"] = len(pages) / stats["best_s"]
+    stages["parse_pool"] = stats
+
+    my_doc, competitors = docs[0], docs[1:]
+    items = sum(
+        len(getattr(d, zone) or [])
+        for d in competitors
+        for zone in ("subheadings", "hrefs", "structures")
+    )
+
+    # Зональная релевантность
+    _, stats = measure(
+        lambda: compare_zones(my_doc, competitors, ZONES, model), args.repeat
+    )
+    stats["docs_per_s"] = len(docs) / stats["best_s"]
+    stages["zone_relevance"] = stats
+
+    # Семантические разрывы
+    gaps, stats = measure(
+        lambda: find_semantic_gaps(my_doc, competitors, KEYWORDS, ZONES, model),
+        args.repeat,
+    )
+    stats["items"] = items
+    stats["items_per_s"] = items / stats["best_s"]
+    stages["gaps"] = stats
+
+    # Одновременные анализы: каждый поток кодирует свои документы напрямую
+    # моделью и через общий сервис, который объединяет запросы в батчи
+    from core.embedding_service import EmbeddingService
+
+    direct = model.model if isinstance(model, EmbeddingService) else model
+    for name, encoder in (("direct", direct), ("service", EmbeddingService(direct))):
+        _, stats = measure(
+            lambda: concurrent_analyses(encoder, my_doc, competitors, args.concurrency),
+            args.repeat,
+        )
+        stats["concurrency"] = args.concurrency
+        stats["docs_per_s"] = args.concurrency * len(docs) / stats["best_s"]
+        if name == "service":
+            stats["service"] = encoder.stats()
+        stages[f"concurrent_{name}"] = stats
+
+    # Промпт и вызов LLM (заглушка)
+    zone_relevance = compare_zones(my_doc, competitors, ZONES, model)
+    _, stats = measure(
+        lambda: analyze_results(my_doc, gaps, KEYWORDS, zone_relevance),
+        args.repeat,
+    )
+    stages["llm"] = stats
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--encoder", choices=["stub", "minilm"], default="stub")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"]
+    )
+    parser.add_argument("--pages-per-size", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--embedding-cache", action="store_true")
+    parser.add_argument("--parse-workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{args.encoder}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, stats in report["stages"].items():
+        print(
+            f"{name:<18} best {stats['best_s'] * 1000:9.1f} ms  "
+            f"peak {stats['peak_python_mb']:7.1f} MB"
+        )
+    print(f"Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
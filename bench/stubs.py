@@ -0,0 +1,92 @@
+"""Детерминированные заглушки модели эмбеддингов и LLM для офлайн-бенчмарков"""
+
+import hashlib
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+
+class StubEncoder:
+    """
+    Заменяет SentenceTransformer: вектор текста — нормированная сумма
+    псевдослучайных векторов его слов (hashing trick). Одинаковый текст всегда
+    даёт одинаковый вектор, похожие тексты — близкие векторы.
+    """
+
+    def __init__(self, dim=384, max_seq_length=128):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.device = torch.device("cpu")
+        self.cache_name = None  # заглушка не пишет в кэш эмбеддингов
+        self._word_vectors = {}
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _word_vector(self, word):
+        vec = self._word_vectors.get(word)
+        if vec is None:
+            seed = int.from_bytes(
+                hashlib.md5(word.encode("utf-8")).digest()[:4], "little"
+            )
+            vec = (
+                np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            )
+            self._word_vectors[word] = vec
+        return vec
+
+    def _encode_one(self, text):
+        words = text.lower().split()[: self.max_seq_length]
+        if not words:
+            return np.zeros(self.dim, dtype=np.float32)
+        vec = np.sum([self._word_vector(w) for w in words], axis=0)
+        return vec / (np.linalg.norm(vec) or 1.0)
+
+    def encode(self, sentences, convert_to_tensor=False, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if sentences:
+            out = np.stack([self._encode_one(s) for s in sentences])
+        else:
+            out = np.zeros((0, self.dim), dtype=np.float32)
+        if single:
+            out = out[0]
+        return torch.from_numpy(out) if convert_to_tensor else out
+
+
+class FakeCompletions:
+    """Имитирует chat.completions клиента OpenAI с фиксированной задержкой"""
+
+    def __init__(self, latency=0.0, answer="Рекомендации: усилить зоны title и h1."):
+        self.latency = latency
+        self.answer = answer
+
+    def create(self, model, messages, temperature=1.0, stream=False, **kwargs):
+        time.sleep(self.latency)
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 3
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=len(self.answer) // 3
+        )
+        if not stream:
+            message = SimpleNamespace(content=self.answer)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=message)], usage=usage
+            )
+
+        def chunks():
+            for word in self.answer.split(" "):
+                delta = SimpleNamespace(content=word + " ")
+                yield SimpleNamespace(
+                    choices=[SimpleNamespace(delta=delta)], usage=None
+                )
+            yield SimpleNamespace(choices=[], usage=usage)
+
+        return chunks()
+
+
+class FakeLLMClient:
+    def __init__(self, latency=0.0):
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency))
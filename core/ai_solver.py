@@ -1,63 +1,377 @@
+import contextvars
 import os
-from dataclasses import asdict
-from functools import lru_cache
-from typing import Any, Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
-import streamlit as st
-from openai import OpenAI
+from core import metrics, registry
+from core.cache import get_llm_cache
+from core.prompt_builder import (
+    COMPETITORS_TOKEN_BUDGET,
+    DOC_TOKEN_BUDGET,
+    count_message_tokens,
+    count_tokens,
+    pack_document,
+    pack_documents,
+    round_scores,
+)
 
-from core.parser import URLData
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+    from core.parser import URLData
 
 
 def get_openai_key() -> str:
-    return os.getenv("OPENAI_KEY") or st.secrets["OPENAI_KEY"]
+    key = os.getenv("OPENAI_KEY")
+    if key:
+        return key
+    # streamlit импортируем только когда ключа нет в окружении
+    import streamlit as st
 
+    return st.secrets["OPENAI_KEY"]
 
-OPENAI_KEY = get_openai_key()
 
+def _create_openai_client() -> "OpenAI":
+    from openai import OpenAI
 
-@lru_cache
-def get_openai_client() -> OpenAI:
     return OpenAI(
         base_url="https://openrouter.ai/api/v1",
         api_key=get_openai_key(),
     )
 
 
+registry.register("openai_client", _create_openai_client)
+
+
+def get_openai_client() -> "OpenAI":
+    return registry.get("openai_client")
+
+
+LLM_MODEL = "mistralai/devstral-2512:free"
+
+# single — один большой запрос по всем зонам, parallel — параллельные запросы
+# по группам зон и короткий запрос, собирающий из них итоговый отчёт
+LLM_MODES = ("single", "parallel")
+LLM_MODE = os.getenv("TEXTMIND_LLM_MODE", "single")
+LLM_CONCURRENCY = int(os.getenv("TEXTMIND_LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("TEXTMIND_LLM_TIMEOUT", "60"))
+LLM_RETRIES = int(os.getenv("TEXTMIND_LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF = 1.0  # секунд перед первым повтором, дальше вдвое больше
+
+# Группы зон для параллельного режима; "text" в промпт не попадает
+LLM_ZONE_GROUPS = {
+    "Заголовки и адрес": ["title", "h1", "url_as_text"],
+    "Первый экран": ["first_500_chars"],
+    "Подзаголовки и структуры": ["subheadings", "structures"],
+    "Ссылки": ["hrefs"],
+}
+STRUCTURE_GROUP = "Структура документа"
+ZONE_GROUP_TASK = """Сформируй рекомендации:
+            1. Сильные ли эти зоны?
+            2. Какие темы/подзаголовки/списки/таблицы внедрить?
+            3. Пример формулировок (коротко, только идеи)."""
+
+
+# Флаг текущего анализа, как и метрики, живёт в contextvar: функции
+# рекомендаций не передают его явно
+_llm_cache_bypass = contextvars.ContextVar("textmind_llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache(bypass: bool = True):
+    """Внутри блока ответы LLM не берутся из кэша; свежие ответы в него пишутся"""
+    token = _llm_cache_bypass.set(bypass)
+    try:
+        yield
+    finally:
+        _llm_cache_bypass.reset(token)
+
+
 def generate_completion(
-    messages: List[Dict[str, str]], temperatura: float = 1.0
+    messages: List[Dict[str, str]],
+    temperatura: float = 1.0,
+    timeout: Optional[float] = None,
+    stage: str = "llm",
+) -> str:
+    """Ответ LLM с учётом кэша: повторный или уже выполняющийся запрос не отправляется"""
+    cache = get_llm_cache()
+    if cache is None:
+        return _request_completion(messages, temperatura, timeout, stage)
+
+    key = cache.fingerprint(LLM_MODEL, messages, temperatura)
+    if not _llm_cache_bypass.get():
+        content = cache.get(key)
+        if content is not None:
+            metrics.incr("llm_cache_hits")
+            return content
+    owner, future = cache.claim(key)
+    if not owner:
+        metrics.incr("llm_cache_shared")
+        try:
+            content = future.result(timeout or LLM_TIMEOUT)
+        except Exception as e:
+            print(f"Не дождались такого же запроса к LLM: {e}")
+            content = None
+        if content:
+            return content
+        return _request_completion(messages, temperatura, timeout, stage)
+
+    metrics.incr("llm_cache_misses")
+    try:
+        content = _request_completion(messages, temperatura, timeout, stage)
+    except Exception as e:
+        cache.release(key, future, error=e)
+        raise
+    cache.release(key, future, content)
+    return content
+
+
+def _request_completion(
+    messages: List[Dict[str, str]],
+    temperatura: float,
+    timeout: Optional[float],
+    stage: str,
 ) -> str:
     client = get_openai_client()
-    completion = client.chat.completions.create(
-        model="mistralai/devstral-2512:free",
+    if timeout:
+        # SDK сам повторяет запрос, в том числе по таймауту; здесь повторами
+        # управляет только generate_completion_with_retries
+        client = client.with_options(max_retries=0, timeout=timeout)
+    with metrics.stage(stage):
+        completion = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            temperature=temperatura,
+        )
+    content = completion.choices[0].message.content
+    usage = getattr(completion, "usage", None)
+    metrics.incr(
+        "prompt_tokens",
+        usage.prompt_tokens if usage else count_message_tokens(messages),
+    )
+    metrics.incr(
+        "completion_tokens",
+        usage.completion_tokens if usage else count_tokens(content or ""),
+    )
+    return content
+
+
+def generate_completion_with_retries(
+    messages: List[Dict[str, str]],
+    temperatura: float = 1.0,
+    retries: int = LLM_RETRIES,
+    timeout: float = LLM_TIMEOUT,
+    stage: str = "llm",
+) -> str:
+    """generate_completion с таймаутом и повторами при ошибке или пустом ответе"""
+    for attempt in range(retries + 1):
+        try:
+            content = generate_completion(messages, temperatura, timeout, stage)
+            if content:
+                return content
+            error = ValueError("LLM вернула пустой ответ")
+        except Exception as e:
+            error = e
+        if attempt < retries:
+            metrics.incr("llm_retries")
+            time.sleep(LLM_RETRY_BACKOFF * 2**attempt)
+    raise error
+
+
+class CompletionStream:
+    """
+    Ответ LLM, отдаваемый по мере генерации.
+
+    Итерация возвращает фрагменты текста; после неё доступны полный текст,
+    время до первого токена и общее время генерации (в секундах).
+    on_done(text, error) вызывается один раз: когда поток дочитан, прерван,
+    закрыт через close() или удалён непрочитанным.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[Any],
+        started: float,
+        prompt_tokens: int = 0,
+        on_done: Optional[Callable[[Optional[str], Optional[Exception]], None]] = None,
+        cached: bool = False,
+    ):
+        self._chunks = chunks
+        self._started = started
+        self._on_done = on_done
+        self.cached = cached
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = 0
+        self.text = ""
+        self.time_to_first_token: Optional[float] = None
+        self.total_time: Optional[float] = None
+        # Поток читается уже после выхода из analyze, поэтому метрики
+        # запуска запоминаются при создании
+        self._metrics = metrics.current()
+
+    @property
+    def finished(self) -> bool:
+        """Поток уже прочитан, полный текст в self.text"""
+        return self.total_time is not None
+
+    @classmethod
+    def from_text(cls, text: str, started: float) -> "CompletionStream":
+        """Поток из готового ответа, например из кэша"""
+        chunk = SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=text))],
+            usage=None,
+        )
+        return cls([chunk], started, cached=True)
+
+    def _done(self, text: Optional[str], error: Optional[Exception]) -> None:
+        on_done, self._on_done = self._on_done, None
+        if on_done is not None:
+            on_done(text, error)
+
+    def close(self) -> None:
+        """Отказ от чтения потока: ожидающие такого же ответа запросят его сами"""
+        if not self.finished:
+            self._done(None, RuntimeError("Поток ответа LLM не прочитан"))
+
+    def __del__(self):
+        self.close()
+
+    def __iter__(self) -> Iterator[str]:
+        parts = []
+        usage = None
+        try:
+            for chunk in self._chunks:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self._started
+                parts.append(delta)
+                yield delta
+        except BaseException as e:
+            # В том числе GeneratorExit, если поток бросили недочитанным
+            if not isinstance(e, Exception):
+                e = RuntimeError("Поток ответа LLM не дочитан")
+            self._done(None, e)
+            raise
+        self.text = "".join(parts)
+        self.total_time = time.perf_counter() - self._started
+        self._done(self.text, None)
+        if self.cached:
+            # Ответ из кэша не тратит ни время LLM, ни токены
+            return
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+        else:
+            self.completion_tokens = count_tokens(self.text)
+
+        if self._metrics is not None:
+            self._metrics.add_time("llm", self.total_time)
+            self._metrics.incr("prompt_tokens", self.prompt_tokens)
+            self._metrics.incr("completion_tokens", self.completion_tokens)
+            if self.time_to_first_token is not None:
+                self._metrics.add_time("llm_first_token", self.time_to_first_token)
+
+
+def stream_completion(
+    messages: List[Dict[str, str]], temperatura: float = 1.0
+) -> CompletionStream:
+    started = time.perf_counter()
+    prompt_tokens = count_message_tokens(messages)
+    cache = get_llm_cache()
+    if cache is None:
+        return CompletionStream(
+            _request_stream(messages, temperatura), started, prompt_tokens
+        )
+
+    key = cache.fingerprint(LLM_MODEL, messages, temperatura)
+    if not _llm_cache_bypass.get():
+        content = cache.get(key)
+        if content is not None:
+            metrics.incr("llm_cache_hits")
+            return CompletionStream.from_text(content, started)
+    owner, future = cache.claim(key)
+    if not owner:
+        metrics.incr("llm_cache_shared")
+        try:
+            content = future.result(LLM_TIMEOUT)
+        except Exception as e:
+            print(f"Не дождались такого же запроса к LLM: {e}")
+            content = None
+        if content:
+            return CompletionStream.from_text(content, started)
+        return CompletionStream(
+            _request_stream(messages, temperatura), started, prompt_tokens
+        )
+
+    metrics.incr("llm_cache_misses")
+    try:
+        chunks = _request_stream(messages, temperatura)
+    except Exception as e:
+        cache.release(key, future, error=e)
+        raise
+    return CompletionStream(
+        chunks,
+        started,
+        prompt_tokens,
+        on_done=lambda text, error: cache.release(key, future, text, error),
+    )
+
+
+def _request_stream(messages: List[Dict[str, str]], temperatura: float) -> Any:
+    client = get_openai_client()
+    return client.chat.completions.create(
+        model=LLM_MODEL,
         messages=messages,
         temperature=temperatura,
+        stream=True,
     )
-    return completion.choices[0].message.content
 
 
-def prepare_doc_for_prompt(doc: URLData) -> Dict[str, Any]:
-    doc_dict = asdict(doc)
-    return {k: v for k, v in doc_dict.items() if k not in ("word_count", "url", "text")}
+def prepare_doc_for_prompt(
+    doc: "URLData",
+    keyword_list: List[str] = (),
+    budget: int = DOC_TOKEN_BUDGET,
+) -> Dict[str, Any]:
+    return pack_document(doc, keyword_list, budget).data
 
 
-def prepare_competitors_for_prompt(docs: List[URLData]) -> List[Dict[str, Any]]:
-    return [
-        {k: v for k, v in asdict(doc).items() if k not in ("word_count", "url", "text")}
-        for doc in docs
-    ]
+def prepare_competitors_for_prompt(
+    docs: List["URLData"],
+    keyword_list: List[str] = (),
+    budget: int = COMPETITORS_TOKEN_BUDGET,
+) -> List[Dict[str, Any]]:
+    return pack_documents(docs, keyword_list, budget).data
 
 
-def analyze_results(
-    MY_DOCUMENT: URLData,
+def build_analysis_messages(
+    MY_DOCUMENT: "URLData",
     semantic_gaps: Dict[str, Any],
     keyword_list: List[str],
     zone_relevance: Dict[str, Any],
-    temperatura: float = 1.0,
     struct: bool = False,
-) -> str:
-    doc_dict = prepare_doc_for_prompt(MY_DOCUMENT)
-    semantic_gaps_for_message = {k: v for k, v in semantic_gaps.items() if k != "text"}
+) -> List[Dict[str, str]]:
+    doc_dict = prepare_doc_for_prompt(MY_DOCUMENT, keyword_list)
+    semantic_gaps_for_message = round_scores(
+        {k: v for k, v in semantic_gaps.items() if k != "text"}
+    )
+    zone_relevance = round_scores(zone_relevance)
     add_struct_instruction = (
         "Сформируй идеальную структуру для документа" if struct else ""
     )
@@ -94,15 +408,217 @@ def analyze_results(
         """,
         },
     ]
+    return messages
+
+
+def analyze_results(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+    temperatura: float = 1.0,
+    struct: bool = False,
+) -> str:
+    messages = build_analysis_messages(
+        MY_DOCUMENT, semantic_gaps, keyword_list, zone_relevance, struct
+    )
     return generate_completion(messages, temperatura)
 
 
-def create_new_page(
-    competitors: List[URLData],
+def analyze_results_stream(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+    temperatura: float = 1.0,
+    struct: bool = False,
+) -> CompletionStream:
+    messages = build_analysis_messages(
+        MY_DOCUMENT, semantic_gaps, keyword_list, zone_relevance, struct
+    )
+    return stream_completion(messages, temperatura)
+
+
+def build_zone_group_messages(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+    zones: List[str],
+    task: str = ZONE_GROUP_TASK,
+) -> List[Dict[str, str]]:
+    """Небольшой промпт только по зонам одной группы"""
+    doc_dict = {
+        k: v
+        for k, v in prepare_doc_for_prompt(MY_DOCUMENT, keyword_list).items()
+        if k in zones
+    }
+    semantic_gaps_for_message = round_scores(
+        {k: v for k, v in semantic_gaps.items() if k in zones}
+    )
+    zone_relevance = round_scores(
+        {k: v for k, v in zone_relevance.items() if k in zones}
+    )
+
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "Ты выступаешь в роли SEO-эксперта. "
+                "У тебя есть результаты анализа моей страницы и страниц конкурентов. "
+                f"Твоя задача: дать рекомендации только по зонам {', '.join(zones)}. "
+                "Отвечай кратко и структурированно."
+            ),
+        },
+        {
+            "role": "user",
+            "content": f"""
+            Ключевые слова: {keyword_list}
+
+            Зоны моего документа: {doc_dict}
+
+            Анализ зон: {zone_relevance}
+
+            Семантические разрывы: {semantic_gaps_for_message}
+
+            {task}
+            Ответ дай на русском.
+        """,
+        },
+    ]
+    return messages
+
+
+def build_merge_messages(
+    parts: Dict[str, str],
     keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+) -> List[Dict[str, str]]:
+    """Промпт, собирающий рекомендации по группам зон в один отчёт"""
+    sections = "\n\n".join(f"## {name}\n{text}" for name, text in parts.items())
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "Ты выступаешь в роли SEO-эксперта. "
+                "У тебя есть рекомендации по отдельным группам зон страницы. "
+                "Твоя задача: собрать из них один отчёт без повторов и без новых тем. "
+                "Отвечай структурированно."
+            ),
+        },
+        {
+            "role": "user",
+            "content": f"""
+            Ключевые слова: {keyword_list}
+
+            Анализ зон: {round_scores(zone_relevance)}
+
+            Рекомендации по группам зон:
+            {sections}
+
+            Собери отчёт:
+            1. Какие зоны сильные?
+            2. Какие зоны слабые?
+            3. Какие темы/подзаголовки/списки/таблицы внедрить?
+            4. Пример формулировок (коротко, только идеи).
+            5. Структура документа, если она есть в рекомендациях.
+            6. Ответ дай на русском.
+        """,
+        },
+    ]
+    return messages
+
+
+def map_zone_groups(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+    temperatura: float = 1.0,
+    struct: bool = False,
+    concurrency: int = LLM_CONCURRENCY,
+) -> Dict[str, str]:
+    """
+    Рекомендации по каждой группе зон отдельными параллельными запросами.
+    Группа, не ответившая после повторов, отмечается в результате, а не
+    прерывает весь анализ
+    """
+    tasks = {
+        name: build_zone_group_messages(
+            MY_DOCUMENT, semantic_gaps, keyword_list, zone_relevance, zones
+        )
+        for name, zones in LLM_ZONE_GROUPS.items()
+    }
+    if struct:
+        tasks[STRUCTURE_GROUP] = build_zone_group_messages(
+            MY_DOCUMENT,
+            semantic_gaps,
+            keyword_list,
+            zone_relevance,
+            ["title", "h1", "subheadings", "structures"],
+            "Сформируй идеальную структуру для документа.",
+        )
+
+    parts = {}
+    with metrics.stage("llm_map"):
+        with ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="textmind-llm"
+        ) as pool:
+            futures = {
+                name: pool.submit(
+                    metrics.bind(generate_completion_with_retries),
+                    messages,
+                    temperatura,
+                    stage="llm_zones",
+                )
+                for name, messages in tasks.items()
+            }
+            for name, future in futures.items():
+                try:
+                    parts[name] = future.result()
+                except Exception as e:
+                    print(f"Не удалось получить рекомендации ({name}): {e}")
+                    metrics.incr("llm_groups_failed")
+                    parts[name] = "Рекомендации по этим зонам получить не удалось."
+    return parts
+
+
+def analyze_results_parallel(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
     temperatura: float = 1.0,
+    struct: bool = False,
 ) -> str:
-    competitors_prepared = prepare_competitors_for_prompt(competitors)
+    parts = map_zone_groups(
+        MY_DOCUMENT, semantic_gaps, keyword_list, zone_relevance, temperatura, struct
+    )
+    messages = build_merge_messages(parts, keyword_list, zone_relevance)
+    return generate_completion_with_retries(messages, temperatura, stage="llm_merge")
+
+
+def analyze_results_parallel_stream(
+    MY_DOCUMENT: "URLData",
+    semantic_gaps: Dict[str, Any],
+    keyword_list: List[str],
+    zone_relevance: Dict[str, Any],
+    temperatura: float = 1.0,
+    struct: bool = False,
+) -> CompletionStream:
+    """Группы зон считаются сразу, по мере генерации отдаётся только итоговый отчёт"""
+    parts = map_zone_groups(
+        MY_DOCUMENT, semantic_gaps, keyword_list, zone_relevance, temperatura, struct
+    )
+    messages = build_merge_messages(parts, keyword_list, zone_relevance)
+    return stream_completion(messages, temperatura)
+
+
+def build_new_page_messages(
+    competitors: List["URLData"],
+    keyword_list: List[str],
+) -> List[Dict[str, str]]:
+    competitors_prepared = prepare_competitors_for_prompt(competitors, keyword_list)
 
     messages = [
         {
@@ -131,4 +647,22 @@ def create_new_page(
         """,
         },
     ]
+    return messages
+
+
+def create_new_page(
+    competitors: List["URLData"],
+    keyword_list: List[str],
+    temperatura: float = 1.0,
+) -> str:
+    messages = build_new_page_messages(competitors, keyword_list)
     return generate_completion(messages, temperatura)
+
+
+def create_new_page_stream(
+    competitors: List["URLData"],
+    keyword_list: List[str],
+    temperatura: float = 1.0,
+) -> CompletionStream:
+    messages = build_new_page_messages(competitors, keyword_list)
+    return stream_completion(messages, temperatura)
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+import numpy as np
+
+from core import registry
+
+CACHE_DIR = os.getenv("TEXTMIND_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "textmind"
+)
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("TEXTMIND_EMBEDDING_CACHE_MB", "512"))
+HTTP_CACHE_MAX_MB = int(os.getenv("TEXTMIND_HTTP_CACHE_MB", "256"))
+# Сколько секунд ответ считается свежим и отдаётся без запроса к сайту;
+# 0 — каждый запуск отправляет условный запрос, ответ 304 дешёвый
+HTTP_CACHE_TTL = int(os.getenv("TEXTMIND_HTTP_CACHE_TTL", "0"))
+LLM_CACHE_MAX_MB = int(os.getenv("TEXTMIND_LLM_CACHE_MB", "64"))
+LLM_CACHE_TTL = int(os.getenv("TEXTMIND_LLM_CACHE_TTL", "86400"))
+
+# Ограничение SQLite на число параметров в одном запросе
+_SQL_CHUNK = 500
+
+
+class SQLiteCache:
+    """Персистентное key -> bytes хранилище с ограничением размера и LRU-вытеснением"""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, size INTEGER, "
+            "created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys, max_age=None):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i : i + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, created_at FROM entries WHERE key IN ({marks})",
+                    chunk,
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if max_age is not None and now - created_at > max_age:
+                        continue
+                    found[key] = value
+            if found:
+                self._conn.executemany(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key, max_age=None):
+        return self.get_many([key], max_age).get(key)
+
+    def put_many(self, items):
+        now = time.time()
+        rows = [(key, value, len(value), now, now) for key, value in items.items()]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def _evict(self):
+        total = self._conn.execute("SELECT SUM(size) FROM entries").fetchone()[0] or 0
+        if total <= self.max_bytes:
+            return
+        # Вытесняем давно не использованные записи до 90% лимита
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at"
+        ):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), SUM(size) FROM entries"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": total or 0,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """Кэш эмбеддингов, адресуемый по имени модели и хэшу нормализованного текста"""
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def make_key(model_name, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, model_name, texts):
+        keys = {self.make_key(model_name, text): text for text in texts}
+        found = self.store.get_many(keys)
+        return {
+            keys[key]: np.frombuffer(value, dtype=np.float32)
+            for key, value in found.items()
+        }
+
+    def put_many(self, model_name, embeddings):
+        self.store.put_many(
+            {
+                self.make_key(model_name, text): np.asarray(
+                    emb, dtype=np.float32
+                ).tobytes()
+                for text, emb in embeddings.items()
+            }
+        )
+
+    def stats(self):
+        return self.store.stats()
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    charset: str | None
+    content_hash: str
+    fetched_at: float
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+
+class HTTPCache:
+    """
+    Кэш загруженных страниц и результатов их разбора.
+
+    Тела ответов хранятся сжатыми вместе с ETag/Last-Modified для условных
+    запросов. Разобранный URLData адресуется по URL, набору исключённых тегов и
+    хэшу содержимого, поэтому неизменившаяся страница не разбирается повторно.
+    """
+
+    def __init__(self, store, ttl=HTTP_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    @staticmethod
+    def content_hash(body):
+        return hashlib.sha256(body).hexdigest()
+
+    @staticmethod
+    def _response_key(url, user_agent):
+        digest = hashlib.sha256(f"{user_agent}\n{url}".encode("utf-8")).hexdigest()
+        return f"http:{digest}"
+
+    @staticmethod
+    def _parsed_key(url, exclude_tags, content_hash):
+        tags = ",".join(sorted(exclude_tags or ()))
+        digest = hashlib.sha256(f"{url}\n{tags}".encode("utf-8")).hexdigest()
+        return f"parsed:{digest}:{content_hash}"
+
+    def get(self, url, user_agent):
+        """Сохранённый ответ (в том числе устаревший) или None"""
+        value = self.store.get(self._response_key(url, user_agent))
+        if value is None:
+            return None
+        size = int.from_bytes(value[:4], "big")
+        meta = json.loads(value[4 : 4 + size])
+        return CachedResponse(body=zlib.decompress(value[4 + size :]), **meta)
+
+    def put(self, url, user_agent, body, etag=None, last_modified=None, charset=None):
+        meta = json.dumps(
+            {
+                "etag": etag,
+                "last_modified": last_modified,
+                "charset": charset,
+                "content_hash": self.content_hash(body),
+                "fetched_at": time.time(),
+            }
+        ).encode("utf-8")
+        self.store.put(
+            self._response_key(url, user_agent),
+            len(meta).to_bytes(4, "big") + meta + zlib.compress(body),
+        )
+
+    def get_parsed(self, url, exclude_tags, content_hash):
+        value = self.store.get(self._parsed_key(url, exclude_tags, content_hash))
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value))
+
+    def put_parsed(self, url, exclude_tags, content_hash, data):
+        value = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self.store.put(self._parsed_key(url, exclude_tags, content_hash), value)
+
+    def stats(self):
+        return self.store.stats()
+
+
+class LLMCache:
+    """
+    Кэш ответов LLM, адресуемый по отпечатку запроса (модель, сообщения,
+    температура). Одинаковые запросы, которые уже выполняются, не отправляются
+    повторно: вызывающие ждут ответа первого через claim/release.
+    """
+
+    def __init__(self, store, ttl=LLM_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._inflight = {}
+        # release может вызваться из __del__ потока ответа посреди claim
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def fingerprint(model, messages, temperature):
+        payload = json.dumps(
+            [model, messages, temperature], ensure_ascii=False, sort_keys=True
+        )
+        return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        value = self.store.get(key, max_age=self.ttl)
+        if value is None:
+            return None
+        return zlib.decompress(value).decode("utf-8")
+
+    def put(self, key, content):
+        self.store.put(key, zlib.compress(content.encode("utf-8")))
+
+    def claim(self, key):
+        """
+        (True, future), если запрос должен выполнить сам вызывающий, и
+        (False, future) уже выполняющегося запроса, результат которого можно ждать
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return False, future
+            future = self._inflight[key] = Future()
+            return True, future
+
+    def release(self, key, future, content=None, error=None):
+        """Завершает запрос, полученный через claim, и будит ожидающих"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            if content:
+                self.put(key, content)
+            future.set_result(content)
+
+    def stats(self):
+        return self.store.stats()
+
+
+def _create_embedding_cache():
+    store = SQLiteCache(
+        os.path.join(CACHE_DIR, "embeddings.sqlite"),
+        EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    )
+    return EmbeddingCache(store)
+
+
+registry.register("embedding_cache", _create_embedding_cache)
+
+
+def get_embedding_cache():
+    """Общий кэш эмбеддингов процесса; None, если кэш отключён"""
+    if EMBEDDING_CACHE_MAX_MB <= 0:
+        return None
+    return registry.get("embedding_cache")
+
+
+def _create_http_cache():
+    store = SQLiteCache(
+        os.path.join(CACHE_DIR, "http.sqlite"), HTTP_CACHE_MAX_MB * 1024 * 1024
+    )
+    return HTTPCache(store)
+
+
+registry.register("http_cache", _create_http_cache)
+
+
+def get_http_cache():
+    """Общий кэш страниц процесса; None, если кэш отключён"""
+    if HTTP_CACHE_MAX_MB <= 0:
+        return None
+    return registry.get("http_cache")
+
+
+def _create_llm_cache():
+    store = SQLiteCache(
+        os.path.join(CACHE_DIR, "llm.sqlite"), LLM_CACHE_MAX_MB * 1024 * 1024
+    )
+    return LLMCache(store)
+
+
+registry.register("llm_cache", _create_llm_cache)
+
+
+def get_llm_cache():
+    """Общий кэш ответов LLM процесса; None, если кэш отключён"""
+    if LLM_CACHE_MAX_MB <= 0:
+        return None
+    return registry.get("llm_cache")
@@ -0,0 +1,155 @@
+"""
+Схлопывание повторяющихся элементов зон (меню, футеры, cookie-плашки).
+
+Элементы конкурентов группируются до кодирования: сначала по нормализованному
+ключу (регистр, пунктуация по краям слов и пробелы не различаются), затем по
+желанию — почти-дубликаты через MinHash или по близости эмбеддингов. Группа
+помнит, у каких конкурентов встречался элемент; кодируется текст её
+представителя, а не ключ.
+"""
+
+import os
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# exact — только нормализованный ключ, minhash — ещё и почти-дубликаты по
+# символьным шинглам, embedding — по косинусной близости эмбеддингов, none — без схлопывания
+DEDUP_METHODS = ("exact", "minhash", "embedding", "none")
+DEDUP_METHOD = os.getenv("TEXTMIND_DEDUP", "exact")
+MINHASH_THRESHOLD = 0.8  # оценка сходства Жаккара по шинглам
+EMBEDDING_THRESHOLD = 0.95  # косинусная близость эмбеддингов
+MINHASH_PERMUTATIONS = 64
+MINHASH_ROWS = 4  # строк сигнатуры в одной LSH-полосе
+SHINGLE_SIZE = 4
+
+_PRIME = (1 << 31) - 1
+# Знаки препинания, которые отбрасываются по краям слов; «+» и «#» значимы (C++, C#)
+_EDGE_PUNCT = ".,;:!?…\"'«»„“”()[]{}<>*_|/\\-–—"
+
+
+@dataclass
+class ItemGroup:
+    key: str  # ключ схлопывания, см. dedup_key
+    text: str  # представитель группы: он кодируется моделью и показывается
+    sources: list = field(default_factory=list)  # URL конкурентов без повторов
+    count: int = 0  # сколько раз элемент встретился всего
+
+
+def dedup_key(text):
+    """Ключ для точных дублей: без регистра, пунктуации по краям слов и лишних пробелов"""
+    words = (word.strip(_EDGE_PUNCT) for word in text.lower().split())
+    key = " ".join(word for word in words if word)
+    return key or text.lower().strip()
+
+
+def group_exact(items):
+    """Группирует пары (источник, текст) по dedup_key, сохраняя порядок появления"""
+    groups = {}
+    for source, text in items:
+        key = dedup_key(text)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = ItemGroup(key=key, text=text)
+        if source not in group.sources:
+            group.sources.append(source)
+        group.count += 1
+    return list(groups.values())
+
+
+def _merge(groups, parent):
+    """Объединяет группы по массиву родителей; представитель — самая частая группа"""
+    clusters = {}
+    for i in range(len(groups)):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        clusters.setdefault(root, []).append(groups[i])
+
+    merged = []
+    for members in clusters.values():
+        head = max(members, key=lambda g: g.count)
+        group = ItemGroup(key=head.key, text=head.text)
+        for member in members:
+            group.sources.extend(s for s in member.sources if s not in group.sources)
+            group.count += member.count
+        merged.append(group)
+    return merged
+
+
+def _union(parent, i, j):
+    while parent[i] != i:
+        i = parent[i]
+    while parent[j] != j:
+        j = parent[j]
+    if i != j:
+        parent[max(i, j)] = min(i, j)
+
+
+def _shingles(text):
+    text = f" {text} "
+    size = min(SHINGLE_SIZE, len(text))
+    return {
+        zlib.crc32(text[i : i + size].encode("utf-8"))
+        for i in range(len(text) - size + 1)
+    }
+
+
+def minhash_signatures(texts, num_perm=MINHASH_PERMUTATIONS, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _PRIME, num_perm).astype(np.uint64)
+    b = rng.randint(0, _PRIME, num_perm).astype(np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        hashes = np.fromiter(_shingles(text), dtype=np.uint64)
+        signatures[i] = ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+    return signatures
+
+
+def merge_minhash(groups, threshold=MINHASH_THRESHOLD):
+    """Склеивает группы с близкими наборами шинглов (LSH по MinHash-сигнатурам)"""
+    if len(groups) < 2:
+        return groups
+    signatures = minhash_signatures([g.key for g in groups])
+    parent = list(range(len(groups)))
+    for start in range(0, signatures.shape[1], MINHASH_ROWS):
+        buckets = {}
+        for i, band in enumerate(signatures[:, start : start + MINHASH_ROWS]):
+            buckets.setdefault(band.tobytes(), []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= threshold:
+                    _union(parent, first, other)
+    return _merge(groups, parent)
+
+
+def merge_similar(groups, similarity, threshold=EMBEDDING_THRESHOLD):
+    """Склеивает группы, чьи эмбеддинги ближе threshold; similarity — матрица n×n"""
+    if len(groups) < 2:
+        return groups
+    parent = list(range(len(groups)))
+    rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        _union(parent, i, j)
+    return _merge(groups, parent)
+
+
+def group_items(items, method=DEDUP_METHOD):
+    """
+    Группы элементов зоны для кодирования. Склейку по эмбеддингам (method="embedding")
+    делает вызывающий код через merge_similar, когда эмбеддинги групп посчитаны.
+    """
+    if method not in DEDUP_METHODS:
+        raise ValueError(f"Неизвестный способ схлопывания {method!r}: {DEDUP_METHODS}")
+    if method == "none":
+        return [
+            ItemGroup(key=dedup_key(text), text=text, sources=[source], count=1)
+            for source, text in items
+        ]
+    groups = group_exact(items)
+    if method == "minhash":
+        groups = merge_minhash(groups)
+    return groups
@@ -0,0 +1,150 @@
+"""
+Общий для процесса сервис кодирования эмбеддингов.
+
+Все анализы (сессии Streamlit, фоновые задачи) кодируют тексты через один
+EmbeddingService: запросы встают в очередь, а единственный рабочий поток
+собирает их в общий батч — пока не наберётся EMBED_MAX_BATCH фрагментов или
+не пройдёт EMBED_MAX_WAIT_MS от первого запроса — и кодирует его одним вызовом
+модели. Так одновременные анализы не делят ядра процессора мелкими вызовами.
+
+Сервис повторяет интерфейс SentenceTransformer, который нужен semantic_analyzer
+(encode, tokenizer, cache_name и т. д.), поэтому подставляется вместо модели.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from core import metrics
+
+# 0 — не объединять запросы, каждый анализ вызывает модель сам
+EMBED_MAX_BATCH = int(os.getenv("TEXTMIND_EMBED_MAX_BATCH", "128"))
+EMBED_MAX_WAIT_MS = float(os.getenv("TEXTMIND_EMBED_MAX_WAIT_MS", "5"))
+LATENCY_WINDOW = 1000  # сколько последних запросов учитывается в перцентилях
+
+
+@dataclass
+class EncodeRequest:
+    sentences: list
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.perf_counter)
+    started_at: float | None = None
+
+
+class EmbeddingService:
+    def __init__(self, model, max_batch=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "sentences": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+        }
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._worker = threading.Thread(
+            target=self._run, name="textmind-embedding-service", daemon=True
+        )
+        self._worker.start()
+
+    def __getattr__(self, name):
+        # tokenizer, cache_name, device, max_seq_length и прочее — от модели
+        return getattr(self.model, name)
+
+    def encode(self, sentences, convert_to_tensor=False, batch_size=None, **kwargs):
+        """Кодирует sentences в общем батче с запросами других анализов"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if kwargs or not sentences:
+            # Нестандартные параметры кодирования в общий батч не смешиваются
+            embeddings = self.model.encode(
+                sentences, convert_to_tensor=True, batch_size=batch_size or 32, **kwargs
+            )
+        else:
+            request = EncodeRequest(list(sentences))
+            depth = self._queue.qsize() + 1
+            self._queue.put(request)
+            with self._lock:
+                self._stats["max_queue_depth"] = max(
+                    self._stats["max_queue_depth"], depth
+                )
+            embeddings = request.future.result()
+            metrics.incr("embedding_service_requests")
+            metrics.add_time("embed_queue", request.started_at - request.queued_at)
+
+        if single:
+            embeddings = embeddings[0]
+        return embeddings if convert_to_tensor else embeddings.cpu().numpy()
+
+    def _collect(self):
+        """Первый запрос из очереди и всё, что успело подойти за max_wait"""
+        batch = [self._queue.get()]
+        size = len(batch[0].sentences)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                request = (
+                    self._queue.get(timeout=timeout)
+                    if timeout > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.sentences)
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            started = time.perf_counter()
+            for request in batch:
+                request.started_at = started
+            sentences = [s for request in batch for s in request.sentences]
+            try:
+                # SentenceTransformer сам сортирует общий батч по длине
+                embeddings = self.model.encode(
+                    sentences, convert_to_tensor=True, batch_size=self.max_batch
+                )
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            offset = 0
+            for request in batch:
+                end = offset + len(request.sentences)
+                request.future.set_result(embeddings[offset:end])
+                offset = end
+
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["sentences"] += size
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], size)
+                self._latencies.extend(finished - r.queued_at for r in batch)
+
+    def stats(self):
+        """Очередь, размеры батчей и задержка запросов с запуска процесса"""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._latencies)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = (
+            stats["sentences"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        if latencies:
+            stats["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000
+            stats["latency_p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000
+        return stats
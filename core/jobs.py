@@ -0,0 +1,140 @@
+"""
+Фоновые задачи анализа.
+
+Анализ выполняется в общем для процесса пуле потоков, а не в потоке сессии
+Streamlit: страница только опрашивает состояние задачи по её ID. Готовые
+результаты хранятся JOB_TTL секунд, поэтому после обновления страницы
+пользователь получает уже посчитанный анализ по ссылке с ?job=. Повторная
+отправка той же формы присоединяется к задаче, только пока она не завершена.
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from core import registry
+
+JOB_WORKERS = int(os.getenv("TEXTMIND_JOB_WORKERS", "2"))
+JOB_TTL = int(os.getenv("TEXTMIND_JOB_TTL", "3600"))
+
+STAGE_LABELS = {
+    "queued": "В очереди",
+    "fetch": "Загрузка страниц",
+    "embed": "Эмбеддинги",
+    "zone_relevance": "Зональная релевантность",
+    "gaps": "Семантические разрывы",
+    "llm": "Рекомендации LLM",
+    "done": "Готово",
+    "failed": "Ошибка",
+}
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: Optional[str] = None
+    status: str = "queued"  # queued, running, done, failed
+    stage: str = "queued"
+    done: int = 0
+    total: int = 0
+    text: str = ""  # рекомендации LLM, пока они генерируются
+    partial: Any = None  # результат, готовый до рекомендаций LLM
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    @property
+    def stage_label(self):
+        return STAGE_LABELS.get(self.stage, self.stage)
+
+    def progress(self, stage, done=0, total=0):
+        """Колбэк прогресса для pipline: стадия и, если есть, k из N"""
+        self.stage = stage
+        self.done = done
+        self.total = total
+
+    def append_text(self, chunk):
+        self.text += chunk
+
+
+class JobManager:
+    def __init__(self, max_workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="textmind-job"
+        )
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self, kind: str, fn: Callable[..., Any], *args, key=None, **kwargs
+    ) -> Job:
+        """
+        Ставит fn(job, *args, **kwargs) в очередь. Если задача с тем же key ещё
+        в очереди или выполняется, возвращается она; после её завершения
+        запускается новая.
+        """
+        with self._lock:
+            self._cleanup()
+            if key is not None:
+                job = self._jobs.get(self._by_key.get(key))
+                if job is not None and not job.finished:
+                    return job
+            job = Job(id=uuid.uuid4().hex, kind=kind, key=key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id) -> Optional[Job]:
+        with self._lock:
+            self._cleanup()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.stage = "done"
+            job.status = "done"
+        except Exception as e:
+            print(f"Задача {job.id} завершилась ошибкой: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.stage = "failed"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _cleanup(self):
+        now = time.time()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.ttl
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job.key is not None and self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+
+registry.register("job_manager", JobManager)
+
+
+def get_job_manager() -> JobManager:
+    """Общая для всех сессий очередь задач"""
+    return registry.get("job_manager")
@@ -1,7 +1,13 @@
+import hashlib
+import json
+
 import pandas as pd
 import streamlit as st
 
-from core.pipline import analyze
+from core import registry
+from core.ai_solver import LLM_MODE
+from core.jobs import get_job_manager
+from core.pipline import analyze, audit
 
 FAQ_TEXT = """
     #### ❓ FAQ: Как работает программа
@@ -54,6 +60,12 @@ FAQ_TEXT = """
     """
 
 
+LLM_MODE_LABELS = {
+    "single": "Одним запросом",
+    "parallel": "Параллельно по группам зон",
+}
+
+
 def clean_input(text):
     return [line.strip() for line in text.splitlines() if line.strip()]
 
@@ -67,6 +79,10 @@ def run_analysis(
     temperatura,
     struct,
     new_page,
+    stream=True,
+    on_progress=None,
+    llm_mode=LLM_MODE,
+    use_llm_cache=True,
 ):
     if not new_page:
         results = analyze(
@@ -77,11 +93,16 @@ def run_analysis(
             exclude_tags_list,
             temperatura,
             struct,
+            stream=stream,
+            on_progress=on_progress,
+            llm_mode=llm_mode,
+            use_llm_cache=use_llm_cache,
         )
         return {
             "zone_relevance": results['zone_relevance'],
             "semantics_gaps": results['semantics_gaps'],
             "results": results['results'],
+            "metrics": results['metrics'],
             "new_page": False,
         }
     else:
@@ -94,11 +115,203 @@ def run_analysis(
             temperatura,
             struct,
             new_page,
+            stream=stream,
+            on_progress=on_progress,
+            llm_mode=llm_mode,
+            use_llm_cache=use_llm_cache,
         )
-        return {"results": results, "new_page": True}
+        return {"results": results, "metrics": results['metrics'], "new_page": True}
+
+
+def run_audit(
+    my_pages,
+    competitors,
+    keywords,
+    user_agent,
+    exclude_tags_list,
+    temperatura,
+    struct,
+    with_llm,
+    on_progress=None,
+    llm_mode=LLM_MODE,
+    use_llm_cache=True,
+):
+    return audit(
+        my_pages,
+        competitors,
+        keywords,
+        user_agent,
+        exclude_tags_list,
+        temperatura,
+        struct,
+        with_llm=with_llm,
+        on_progress=on_progress,
+        llm_mode=llm_mode,
+        use_llm_cache=use_llm_cache,
+    )
+
+
+def _analysis_job(job, form_data):
+    analysis = run_analysis(**form_data, on_progress=job.progress)
+    results = analysis["results"]
+    if analysis["new_page"]:
+        results = results["results"]
+    # Зоны и разрывы показываются сразу, рекомендации LLM допечатываются под ними:
+    # поток дочитывается в задаче, страница показывает уже полученный текст
+    job.partial = analysis
+    if not isinstance(results, str):
+        for chunk in results:
+            job.append_text(chunk)
+    return analysis
+
+
+def _audit_job(job, form_data):
+    return run_audit(**form_data, on_progress=job.progress)
+
+
+JOB_FUNCTIONS = {"analysis": _analysis_job, "audit": _audit_job}
+
+
+def submit_job(kind, form_data):
+    """
+    Отправляет анализ в фоновую очередь. Одинаковые формы, отправленные пока
+    задача ещё идёт, получают её же; без кэша LLM анализ всегда новый
+    """
+    payload = json.dumps([kind, form_data], ensure_ascii=False, sort_keys=True)
+    key = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    if not form_data.get("use_llm_cache", True):
+        key = None
+    return get_job_manager().submit(kind, JOB_FUNCTIONS[kind], form_data, key=key)
+
+
+@st.fragment(run_every=1)
+def display_job_progress(job_id):
+    """Опрашивает задачу раз в секунду, пока она не завершится"""
+    job = get_job_manager().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    text = job.stage_label
+    value = 0.0
+    if job.total:
+        text += f" ({job.done}/{job.total})"
+        value = job.done / job.total
+    st.progress(value, text=text)
 
+    analysis = job.partial
+    if analysis is not None:
+        if not analysis["new_page"]:
+            display_zones(analysis["zone_relevance"], analysis["semantics_gaps"])
+        st.subheader("Итоговый анализ")
+    if job.text:
+        st.markdown(job.text, unsafe_allow_html=True)
 
-def display_results(zone_relevance, semantics_gaps, results):
+
+def display_job(job):
+    if job.status == "failed":
+        st.error(f"Анализ завершился ошибкой: {job.error}")
+        return
+
+    analysis = job.result
+    if job.kind == "audit":
+        display_audit(analysis["pages"], analysis["metrics"])
+        st.success("Аудит завершён ✅")
+        return
+
+    if analysis["new_page"]:
+        st.subheader("Итоговый анализ")
+        display_recommendations(analysis["results"]["results"])
+        display_metrics(analysis["metrics"])
+    else:
+        display_results(
+            analysis["zone_relevance"],
+            analysis["semantics_gaps"],
+            analysis["results"],
+            analysis["metrics"],
+        )
+    st.success("Анализ завершён ✅")
+
+
+def show_job(job_id):
+    """Прогресс или результат задачи; после переподключения берётся готовый результат"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.info("Результат анализа больше не хранится, запустите анализ заново")
+        del st.query_params["job"]
+    elif not job.finished:
+        display_job_progress(job.id)
+    else:
+        display_job(job)
+
+
+def display_audit(pages, run_metrics=None):
+    st.subheader("Зональная релевантность страниц ТОПу")
+    table = pd.DataFrame({page["url"]: page["zone_relevance"] for page in pages}).T
+    st.dataframe(table)
+
+    for page in pages:
+        with st.expander(page["url"]):
+            st.markdown("**Семантические разрывы**")
+            st.json(page["semantics_gaps"], expanded=False)
+            if page["results"] is not None:
+                st.markdown("**Рекомендации**")
+                display_recommendations(page["results"])
+
+    if run_metrics is not None:
+        display_metrics(run_metrics)
+
+
+def display_recommendations(results):
+    """Выводит рекомендации LLM; потоковый ответ печатается по мере генерации"""
+    if isinstance(results, str):
+        st.markdown(results, unsafe_allow_html=True)
+        return
+
+    if results.finished:
+        st.markdown(results.text, unsafe_allow_html=True)
+    else:
+        st.write_stream(results)
+    if results.cached:
+        st.caption("Ответ LLM взят из кэша")
+    elif results.time_to_first_token is not None:
+        st.caption(
+            f"Первый токен: {results.time_to_first_token:.1f} с, "
+            f"генерация: {results.total_time:.1f} с, "
+            f"промпт: ~{results.prompt_tokens} токенов"
+        )
+
+
+def display_metrics(run_metrics):
+    """Панель со временем стадий и счётчиками запуска"""
+    data = run_metrics.as_dict()
+    with st.expander("Метрики выполнения"):
+        if data["stages"]:
+            stages = pd.DataFrame.from_dict(
+                data["stages"], orient="index", columns=["секунды"]
+            )
+            st.dataframe(stages)
+            if "fetch_embed" in data["stages"]:
+                st.caption(
+                    "Стадии пересекаются: fetch_embed включает загрузку (fetch), "
+                    "разбор (parse) и кодирование (embed) страниц, идущие внахлёст"
+                )
+        if data["counters"]:
+            counters = pd.DataFrame.from_dict(
+                data["counters"], orient="index", columns=["значение"]
+            )
+            st.dataframe(counters)
+        if registry.is_loaded("embedding_service"):
+            # Очередь и батчи общие для всех анализов процесса
+            st.caption("Сервис эмбеддингов")
+            service = pd.DataFrame.from_dict(
+                registry.get("embedding_service").stats(),
+                orient="index",
+                columns=["значение"],
+            )
+            st.dataframe(service)
+
+
+def display_zones(zone_relevance, semantics_gaps):
     st.subheader("Зональная релевантность ТОПу")
     df = pd.DataFrame.from_dict(zone_relevance, orient="index", columns=["relevance"])
     st.bar_chart(df.sort_values("relevance", ascending=True))
@@ -106,5 +319,13 @@ def display_results(zone_relevance, semantics_gaps, results):
     st.subheader("Семантические разрывы")
     st.json(semantics_gaps)
 
+
+def display_results(zone_relevance, semantics_gaps, results, run_metrics=None):
+    display_zones(zone_relevance, semantics_gaps)
+
     st.subheader("Итоговый анализ")
-    st.markdown(results, unsafe_allow_html=True)
+    display_recommendations(results)
+
+    # Метрики выводятся после рекомендаций, когда поток LLM уже дочитан
+    if run_metrics is not None:
+        display_metrics(run_metrics)
@@ -0,0 +1,97 @@
+"""
+Запоминание результатов стадий анализа между запусками.
+
+Анализ разбит на стадии (страницы конкурентов, профиль конкурентов, зональная
+релевантность, разрывы), результат каждой хранится в памяти процесса под
+ключом из её входов. Если пользователь меняет только ключи, температуру или
+«Формировать структуру», профиль конкурентов берётся готовым, а пересчитываются
+лишь стадии ниже изменившегося входа. Моя страница загружается заново при
+каждом запуске, поэтому её правки сразу попадают в анализ. Ответы LLM
+запоминаются отдельно кэшем по отпечатку промпта (core.cache.LLMCache).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+
+from core import metrics, registry
+
+STAGE_CACHE_ENTRIES = int(os.getenv("TEXTMIND_STAGE_CACHE_ENTRIES", "64"))
+STAGE_CACHE_TTL = int(os.getenv("TEXTMIND_STAGE_CACHE_TTL", "3600"))
+
+
+def fingerprint(*parts):
+    """Хэш входов стадии; URLData и другие dataclass сравниваются по содержимому"""
+
+    def default(value):
+        if is_dataclass(value):
+            return asdict(value)
+        return str(value)
+
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """LRU результатов стадий в памяти процесса с ограничением числа записей и TTL"""
+
+    def __init__(self, max_entries=STAGE_CACHE_ENTRIES, ttl=STAGE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, stage, key):
+        with self._lock:
+            entry = self._entries.get((stage, key))
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() > expires_at:
+                del self._entries[(stage, key)]
+                return None
+            self._entries.move_to_end((stage, key))
+            return value
+
+    def put(self, stage, key, value, ttl=None):
+        with self._lock:
+            self._entries[(stage, key)] = (value, time.time() + (ttl or self.ttl))
+            self._entries.move_to_end((stage, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, stage, key, compute, ttl=None):
+        value = self.get(stage, key)
+        if value is not None:
+            metrics.incr(f"{stage}_cache_hits")
+            return value
+        metrics.incr(f"{stage}_cache_misses")
+        value = compute()
+        self.put(stage, key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+registry.register("stage_cache", StageCache)
+
+
+def get_stage_cache():
+    """Общий для сессий кэш стадий; None, если он отключён"""
+    if STAGE_CACHE_ENTRIES <= 0:
+        return None
+    return registry.get("stage_cache")
+
+
+def memoize(stage, key, compute, ttl=None):
+    """Результат стадии из общего кэша или compute(); без кэша просто compute()"""
+    cache = get_stage_cache()
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(stage, key, compute, ttl)
@@ -0,0 +1,92 @@
+"""
+Лёгкая инструментация анализа: время по стадиям и счётчики.
+
+Метрики пишутся в RunMetrics текущего запуска, который хранится в contextvar,
+поэтому parser, semantic_analyzer и ai_solver не требуют явной передачи
+объекта. Вне collect() все вызовы ничего не делают.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("textmind_metrics", default=None)
+
+
+class RunMetrics:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+
+@contextmanager
+def collect():
+    """Начинает сбор метрик для кода внутри блока"""
+    metrics = RunMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def add_time(name, seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(name, seconds)
+
+
+def incr(name, value=1):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.incr(name, value)
+
+
+def bind(fn):
+    """Оборачивает функцию для запуска в другом потоке с текущими метриками"""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # Один Context нельзя войти из нескольких потоков одновременно
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
@@ -1,8 +1,41 @@
-from dataclasses import dataclass
+import codecs
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
 from urllib.parse import urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from requests.adapters import HTTPAdapter
+
+from core import metrics, registry
+from core.cache import HTTPCache, get_http_cache
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_PER_HOST = 2
+# Разбор HTML идёт в отдельных процессах; 0 — разбирать в потоке загрузки
+DEFAULT_PARSE_WORKERS = int(
+    os.getenv("TEXTMIND_PARSE_WORKERS", min(4, (os.cpu_count() or 1) - 1))
+)
+
+# Страницы больше лимита дочитываются только до него, остаток не загружается
+MAX_PAGE_BYTES = int(float(os.getenv("TEXTMIND_MAX_PAGE_MB", "5")) * 1024 * 1024)
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# Объявление кодировки в meta по стандарту HTML должно быть в первых 1024 байтах
+CHARSET_SNIFF_BYTES = 4096
+
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.IGNORECASE)
 
 
 @dataclass
@@ -19,6 +52,22 @@ class URLData:
     word_count: int | None = None
 
 
+@dataclass
+class FetchStatus:
+    url: str
+    status: str = "pending"  # ok, http_error, error, timeout
+    status_code: int | None = None
+    elapsed: float = 0.0
+    error: str | None = None
+    charset: str | None = None
+    content_hash: str | None = None
+    truncated: bool = False  # тело обрезано по MAX_PAGE_BYTES
+    cached: bool = False  # ответ взят из кэша без загрузки или после 304
+
+
+HEADING_TAGS = ["h2", "h3", "h4", "h5", "h6"]
+FIRST_CHARS = 500
+
 target_tags = [
     "h2",
     "h3",
@@ -36,6 +85,18 @@ target_tags = [
     "aside",
     "main",
 ]
+TARGET_TAGS = set(target_tags)
+
+# Типы строк, которые учитывает get_text (без комментариев, doctype и т.п.)
+TEXT_TYPES = (NavigableString, CData)
+
+# lxml заметно быстрее встроенного html.parser, но является опциональной зависимостью
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
 
 def extract_url_path(url):
@@ -44,111 +105,542 @@ def extract_url_path(url):
     return path_text.replace("/", " ").replace("-", " ").replace("_", " ")
 
 
-def build_url_data(url_str, row_html, exclude_tags_list):
-    soup = BeautifulSoup(row_html, "html.parser")
+class _Collector:
+    __slots__ = ("kind", "parts", "slot")
 
-    # Удаляем мусор
-    for tag in soup(exclude_tags_list):
-        tag.extract()
+    def __init__(self, kind, slot=None):
+        self.kind = kind
+        self.parts = []
+        self.slot = slot  # позиция в выходном списке, чтобы сохранить порядок документа
 
-    url_data = URLData()
-    url_data.url = url_str
+    def text(self):
+        return "".join(self.parts)
 
-    url_data.url_as_text = extract_url_path(url_str)
 
-    # Title
-    title_tag = soup.title
-    url_data.title = title_tag.get_text(strip=True) if title_tag else None
+class _ZoneExtractor:
+    """Собирает все зоны страницы за один обход дерева.
 
-    # H1
-    h1_tag = soup.find("h1")
-    url_data.h1 = h1_tag.get_text(strip=True) if h1_tag else None
+    Каждая текстовая нода посещается один раз: она попадает во все открытые
+    сборщики (title, h1, подзаголовок, ссылка, ячейка, пункт списка), в плоский
+    текст — если лежит внутри target_tags и вне списков и таблиц.
+    """
 
-    # First 500 chars
-    try:
-        text_after_h1 = "".join(h1_tag.find_all_next(string=True))
-        if text_after_h1:
-            first_500_chars = text_after_h1.strip()[:500]
-            url_data.first_500_chars = first_500_chars
-    except:
-        url_data.first_500_chars = None
-
-    # Subheadings
-    subheads = []
-    for lvl in ["h2", "h3", "h4", "h5", "h6"]:
-        for el in soup.find_all(lvl):
-            txt = el.get_text(strip=True)
-            if txt:
-                subheads.append(txt)
-    url_data.subheadings = subheads
-
-    # Hrefs
-    link_texts = []
-    for a in soup.find_all("a", href=True):
-        txt = a.get_text(strip=True)
-        if txt:
-            link_texts.append(txt)
-
-    url_data.hrefs = link_texts if link_texts else None
-
-    # Плоский текст (без списков и таблиц)
-    text_parts = []
-    for tag in target_tags:
-        for element in soup.find_all(tag):
-            txt = element.get_text(strip=True)
-            if txt:
-                text_parts.append(txt)
-
-    full_text = " ".join(text_parts)
-    url_data.text = full_text
-    url_data.word_count = len(full_text.split())
+    def __init__(self, exclude_tags_list):
+        self.exclude = set(exclude_tags_list)
+        self.title = None
+        self.h1 = None
+        self.first_parts = None
+        self.first_len = 0
+        self.subheadings = {lvl: [] for lvl in HEADING_TAGS}
+        self.hrefs = []
+        self.text_parts = []
+        self.rows = []
+        self.list_items = []
+
+        self._title_seen = False
+        self._open = []
+        self._open_rows = []
+        self._target_depth = 0
+        self._struct_depth = 0
+        self._table_depth = 0
+        self._list_depth = 0
+
+    def feed(self, soup):
+        frames = [(iter(soup.children), None)]
+        while frames:
+            node = next(frames[-1][0], None)
+            if node is None:
+                _, opened = frames.pop()
+                if opened is not None:
+                    self._close(*opened)
+                continue
+            if isinstance(node, Tag):
+                if node.name in self.exclude:
+                    continue
+                frames.append((iter(node.children), (node, self._enter(node))))
+            elif type(node) in TEXT_TYPES:
+                self._text(node)
+        return self
+
+    def _enter(self, tag):
+        name = tag.name
+        opened = []
 
-    # --- СТРУКТУРЫ: списки и таблицы ---
-    structures = []
+        if name == "title" and not self._title_seen:
+            self._title_seen = True
+            opened.append(_Collector("title"))
+        elif name == "h1" and self.first_parts is None:
+            self.first_parts = []
+            opened.append(_Collector("h1"))
+        elif name in HEADING_TAGS:
+            opened.append(_Collector(name))
 
-    # Таблицы (каждая строка -> одна строка текста)
-    for table in soup.find_all("table"):
-        for tr in table.find_all("tr"):
-            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
+        if name == "a" and tag.get("href") is not None:
+            opened.append(_Collector("a"))
+
+        if name == "tr" and self._table_depth:
+            self.rows.append(None)
+            self._open_rows.append((len(self.rows) - 1, []))
+        elif name in ("td", "th") and self._open_rows:
+            opened.append(_Collector("cell"))
+        elif name == "li" and self._list_depth:
+            self.list_items.append(None)
+            opened.append(_Collector("li", len(self.list_items) - 1))
+
+        if name in TARGET_TAGS:
+            self._target_depth += 1
+        if name == "table":
+            self._table_depth += 1
+            self._struct_depth += 1
+        elif name in ("ul", "ol"):
+            self._list_depth += 1
+            self._struct_depth += 1
+
+        self._open.extend(opened)
+        return opened
+
+    def _close(self, tag, opened):
+        name = tag.name
+
+        for collector in reversed(opened):
+            self._open.pop()
+            txt = collector.text()
+            if collector.kind == "title":
+                self.title = txt
+            elif collector.kind == "h1":
+                self.h1 = txt
+            elif collector.kind == "a":
+                if txt:
+                    self.hrefs.append(txt)
+            elif collector.kind == "cell":
+                self._open_rows[-1][1].append(txt)
+            elif collector.kind == "li":
+                self.list_items[collector.slot] = txt
+            elif txt:
+                self.subheadings[collector.kind].append(txt)
+
+        if name == "tr" and self._table_depth:
+            slot, cells = self._open_rows.pop()
             if cells:
-                structures.append(" ".join(cells))
+                self.rows[slot] = " ".join(cells)
+
+        if name in TARGET_TAGS:
+            self._target_depth -= 1
+        if name == "table":
+            self._table_depth -= 1
+            self._struct_depth -= 1
+        elif name in ("ul", "ol"):
+            self._list_depth -= 1
+            self._struct_depth -= 1
+
+    def _text(self, string):
+        if self.first_parts is not None and self.first_len < FIRST_CHARS:
+            self.first_parts.append(string)
+            if self.first_len:
+                self.first_len += len(string)
+            else:
+                self.first_len = len(string.lstrip())
+
+        txt = string.strip()
+        if not txt:
+            return
+        for collector in self._open:
+            collector.parts.append(txt)
+        if self._target_depth and not self._struct_depth:
+            self.text_parts.append(txt)
+
+    def first_chars(self):
+        if self.first_parts is None:
+            return None
+        return "".join(self.first_parts).strip()[:FIRST_CHARS]
 
-    # Списки (каждый элемент -> отдельная строка)
-    for ul in soup.find_all(["ul", "ol"]):
-        for li in ul.find_all("li"):
-            txt = li.get_text(strip=True)
-            if txt:
-                structures.append(txt)
 
+def build_url_data(url_str, row_html, exclude_tags_list, parser=None, encoding=None):
+    with metrics.stage("parse"):
+        if isinstance(row_html, bytes):
+            soup = BeautifulSoup(
+                row_html, parser or HTML_PARSER, from_encoding=encoding
+            )
+        else:
+            soup = BeautifulSoup(row_html, parser or HTML_PARSER)
+        zones = _ZoneExtractor(exclude_tags_list).feed(soup)
+
+    url_data = URLData()
+    url_data.url = url_str
+    url_data.url_as_text = extract_url_path(url_str)
+    url_data.title = zones.title
+    url_data.h1 = zones.h1
+    url_data.first_500_chars = zones.first_chars()
+    url_data.subheadings = [
+        txt for lvl in HEADING_TAGS for txt in zones.subheadings[lvl]
+    ]
+    url_data.hrefs = zones.hrefs if zones.hrefs else None
+
+    # Плоский текст (без списков и таблиц), каждый фрагмент учитывается один раз
+    full_text = " ".join(zones.text_parts)
+    url_data.text = full_text
+    url_data.word_count = len(full_text.split())
+
+    # Структуры: строки таблиц, затем пункты списков
+    structures = [txt for txt in zones.rows + zones.list_items if txt]
     url_data.structures = structures if structures else None
 
     return url_data
 
 
-def parse_url(u, user_agent, exclude_tags_list):
-    url_data = URLData(url=u)
+def _parse_in_worker(url_str, body, exclude_tags_list, encoding):
+    started = time.perf_counter()
+    url_data = build_url_data(url_str, body, exclude_tags_list, encoding=encoding)
+    return url_data, time.perf_counter() - started
+
+
+def get_parse_pool(workers=DEFAULT_PARSE_WORKERS):
+    """Общий для процесса пул разбора HTML; None, если разбор идёт в потоках"""
+    if workers <= 0:
+        return None
+    name = f"parse_pool_{workers}"
+    # spawn, а не fork: родительский процесс держит потоки и модель torch
+    registry.register(
+        name,
+        lambda: ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ),
+    )
+    return registry.get(name)
+
+
+def parse_documents(pages, exclude_tags_list, workers=DEFAULT_PARSE_WORKERS):
+    """Разбирает уже загруженные страницы [(url, html), ...] в пуле процессов"""
+    pool = get_parse_pool(workers)
+    if pool is None:
+        return [build_url_data(u, html, exclude_tags_list) for u, html in pages]
+    futures = [
+        pool.submit(_parse_in_worker, u, html, exclude_tags_list, None)
+        for u, html in pages
+    ]
+    results = []
+    for future in futures:
+        url_data, elapsed = future.result()
+        metrics.add_time("parse", elapsed)
+        results.append(url_data)
+    return results
+
+
+def create_session(pool_size=DEFAULT_MAX_WORKERS):
+    """Сессия с пулом keep-alive соединений, общая для всех запросов"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def detect_charset(body, content_type=None):
+    """
+    Кодировка страницы без полного статистического анализа тела: заголовок
+    Content-Type, затем meta в начале документа, затем проверка на UTF-8.
+    None — определить кодировку не удалось, её угадает парсер.
+    """
+    match = _CHARSET_RE.search(content_type or "")
+    if match:
+        return match.group(1)
+    match = _META_CHARSET_RE.search(body[:CHARSET_SNIFF_BYTES])
+    if match:
+        return match.group(1).decode("ascii")
+    try:
+        # Неполный последний символ (обрезанное тело) ошибкой не считается
+        codecs.getincrementaldecoder("utf-8")().decode(body, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return None
+
+
+def read_body(response, max_bytes=MAX_PAGE_BYTES):
+    """Читает тело ответа кусками, прерывая загрузку на max_bytes; (тело, обрезано ли)"""
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            return b"".join(chunks)[:max_bytes], True
+    return b"".join(chunks), False
+
+
+def fetch_page(u, user_agent, session=None, max_bytes=MAX_PAGE_BYTES, revalidate=False):
+    """
+    Загружает страницу; возвращает тело в байтах (или None) и статус загрузки.
+
+    Свежий ответ из кэша отдаётся без запроса, устаревший (или любой при
+    revalidate) проверяется условным запросом с If-None-Match/If-Modified-Since.
+    Тело читается потоком и не больше max_bytes.
+    """
+    status = FetchStatus(url=u)
+    started = time.perf_counter()
+    cache = get_http_cache()
+    cached = cache.get(u, user_agent) if cache is not None else None
+    if cached is not None and not revalidate and cached.is_fresh(cache.ttl):
+        metrics.incr("http_cache_hits")
+        status.status = "ok"
+        status.cached = True
+        status.charset = cached.charset
+        status.content_hash = cached.content_hash
+        status.elapsed = time.perf_counter() - started
+        return cached.body, status
+
+    headers = {
+        "Accept-Charset": "utf-8",
+        "User-Agent": user_agent,
+    }
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
     try:
-        r = requests.get(
+        with (session or requests).get(
             u,
-            headers={
-                "Accept-Charset": "utf-8",
-                "User-Agent": user_agent,
-            },
+            headers=headers,
             timeout=10,
             allow_redirects=True,
-        )
-        if r.status_code == 200:
-            url_data = build_url_data(u, r.text, exclude_tags_list)
-        else:
-            print(f"Не удалось получить страницу {u}: статус {r.status_code}")
+            stream=True,
+        ) as r:
+            status.status_code = r.status_code
+            if r.status_code == 304 and cached is not None:
+                # Страница не изменилась: продлеваем свежесть сохранённого ответа
+                metrics.incr("http_cache_revalidated")
+                cache.put(
+                    u,
+                    user_agent,
+                    cached.body,
+                    r.headers.get("ETag") or cached.etag,
+                    r.headers.get("Last-Modified") or cached.last_modified,
+                    cached.charset,
+                )
+                status.status = "ok"
+                status.cached = True
+                status.charset = cached.charset
+                status.content_hash = cached.content_hash
+                return cached.body, status
+            if r.status_code == 200:
+                body, status.truncated = read_body(r, max_bytes)
+                metrics.incr("bytes_fetched", len(body))
+                if status.truncated:
+                    metrics.incr("pages_truncated")
+                    print(f"Страница {u} больше {max_bytes} байт, загружено начало")
+                status.status = "ok"
+                status.charset = detect_charset(body, r.headers.get("Content-Type"))
+                status.content_hash = HTTPCache.content_hash(body)
+                if cache is not None:
+                    metrics.incr("http_cache_misses")
+                    # Обрезанное тело не кэшируем, иначе оно отдавалось бы как полное
+                    if not status.truncated:
+                        cache.put(
+                            u,
+                            user_agent,
+                            body,
+                            r.headers.get("ETag"),
+                            r.headers.get("Last-Modified"),
+                            status.charset,
+                        )
+                metrics.incr("pages_fetched")
+                return body, status
+        metrics.incr("pages_failed")
+        status.status = "http_error"
+        print(f"Не удалось получить страницу {u}: статус {r.status_code}")
     except requests.RequestException as e:
+        metrics.incr("pages_failed")
+        status.status = "error"
+        status.error = str(e)
         print(f"Ошибка при запросе {u}: {e}")
+    finally:
+        status.elapsed = time.perf_counter() - started
+    return None, status
+
+
+def get_cached_url_data(u, status, exclude_tags_list):
+    """Ранее разобранный URLData для того же содержимого страницы или None"""
+    cache = get_http_cache()
+    if cache is None or status.content_hash is None:
+        return None
+    data = cache.get_parsed(u, exclude_tags_list, status.content_hash)
+    if data is None:
+        return None
+    metrics.incr("parsed_cache_hits")
+    return URLData(**data)
+
+
+def store_url_data(url_data, status, exclude_tags_list):
+    cache = get_http_cache()
+    if cache is not None and status.content_hash is not None and not status.truncated:
+        cache.put_parsed(
+            url_data.url, exclude_tags_list, status.content_hash, asdict(url_data)
+        )
+
+
+def parse_url(u, user_agent, exclude_tags_list, session=None, revalidate=False):
+    with metrics.stage("fetch"):
+        body, status = fetch_page(u, user_agent, session, revalidate=revalidate)
+    if body is None:
+        return URLData(url=u)
+    url_data = get_cached_url_data(u, status, exclude_tags_list)
+    if url_data is None:
+        url_data = build_url_data(u, body, exclude_tags_list, encoding=status.charset)
+        store_url_data(url_data, status, exclude_tags_list)
     return url_data
 
 
-def parse_urls(url_list, user_agent, exclude_tags_list):
-    results = []
-    for u in url_list:
-        url_data = parse_url(u, user_agent, exclude_tags_list)
-        results.append(url_data)
+def iter_parse_urls(
+    url_list,
+    user_agent,
+    exclude_tags_list,
+    max_workers=DEFAULT_MAX_WORKERS,
+    max_per_host=DEFAULT_MAX_PER_HOST,
+    deadline=None,
+    parse_workers=DEFAULT_PARSE_WORKERS,
+    queue_size=None,
+    revalidate=(),
+):
+    """Загружает и разбирает страницы, отдавая (индекс, URLData, FetchStatus) по мере готовности.
+
+    Каждая страница выдаётся ровно один раз; неудачная загрузка или разбор дают
+    пустой URLData. queue_size ограничивает число загруженных, но ещё не
+    забранных потребителем страниц: когда он не успевает, потоки загрузки ждут.
+    URL из revalidate проверяются условным запросом, даже если кэш ещё свежий.
+    """
+    if not url_list:
+        return
+
+    started = time.perf_counter()
+    session = create_session(max_workers)
+    pool = get_parse_pool(parse_workers)
+    host_limits = {
+        host: threading.Semaphore(max_per_host)
+        for host in {urlparse(u).netloc for u in url_list}
+    }
+    slots = threading.Semaphore(queue_size or max_workers)
+    stop = threading.Event()
+
+    def worker(u):
+        with host_limits[urlparse(u).netloc]:
+            body, status = fetch_page(
+                u, user_agent, session, revalidate=u in revalidate
+            )
+        if body is None:
+            return None, status, None
+        # Ждём места в очереди, чтобы не копить страницы быстрее, чем их забирают
+        while not slots.acquire(timeout=0.1):
+            if stop.is_set():
+                return None, status, None
+        url_data = get_cached_url_data(u, status, exclude_tags_list)
+        if url_data is not None:
+            return url_data, status, None
+        if pool is not None:
+            try:
+                # Поток не ждёт разбора и сразу освобождается для следующей загрузки
+                future = pool.submit(
+                    _parse_in_worker, u, body, exclude_tags_list, status.charset
+                )
+                return future, status, body
+            except BrokenProcessPool:
+                registry.reset(f"parse_pool_{parse_workers}")
+        url_data = build_url_data(u, body, exclude_tags_list, encoding=status.charset)
+        store_url_data(url_data, status, exclude_tags_list)
+        return url_data, status, None
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    worker = metrics.bind(worker)
+    fetching = {executor.submit(worker, u): i for i, u in enumerate(url_list)}
+    parsing = {}
+    try:
+        while fetching or parsing:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - (time.perf_counter() - started))
+            done, _ = wait(
+                set(fetching) | set(parsing),
+                timeout=timeout,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future in fetching:
+                    i = fetching.pop(future)
+                    parsed, status, body = future.result()
+                    if parsed is None:
+                        yield i, URLData(url=url_list[i]), status
+                    elif isinstance(parsed, URLData):
+                        slots.release()
+                        yield i, parsed, status
+                    else:
+                        parsing[parsed] = (i, status, body)
+                    continue
+
+                i, status, body = parsing.pop(future)
+                slots.release()
+                try:
+                    url_data, elapsed = future.result()
+                    metrics.add_time("parse", elapsed)
+                except BrokenProcessPool as e:
+                    # Пул процессов упал — разбираем страницу на месте
+                    print(f"Ошибка разбора {url_list[i]} в пуле процессов: {e}")
+                    registry.reset(f"parse_pool_{parse_workers}")
+                    url_data = build_url_data(
+                        url_list[i], body, exclude_tags_list, encoding=status.charset
+                    )
+                store_url_data(url_data, status, exclude_tags_list)
+                yield i, url_data, status
+
+        if fetching:
+            metrics.incr("pages_failed", len(fetching))
+        for future, i in fetching.items():
+            print(f"Не удалось получить страницу {url_list[i]}: превышен срок")
+            yield i, URLData(url=url_list[i]), FetchStatus(
+                url=url_list[i], status="timeout"
+            )
+        for future, (i, status, _) in parsing.items():
+            future.cancel()
+            print(f"Не удалось разобрать страницу {url_list[i]}: превышен срок")
+            yield i, URLData(url=url_list[i]), status
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Сессию закрываем, только если не осталось зависших запросов
+        if not fetching:
+            session.close()
+
+
+def parse_urls(
+    url_list,
+    user_agent,
+    exclude_tags_list,
+    max_workers=DEFAULT_MAX_WORKERS,
+    max_per_host=DEFAULT_MAX_PER_HOST,
+    deadline=None,
+    on_status=None,
+    parse_workers=DEFAULT_PARSE_WORKERS,
+):
+    """Параллельно загружает и разбирает страницы.
+
+    Порядок результатов совпадает с url_list; неудачная загрузка даёт пустой URLData.
+    max_per_host ограничивает число одновременных запросов к одному хосту,
+    deadline — общее время ожидания в секундах, on_status(FetchStatus) вызывается
+    для каждого URL по мере готовности. Загруженный HTML уходит на разбор в пул
+    из parse_workers процессов, пока потоки продолжают загрузку остальных страниц.
+    """
+    results = [URLData(url=u) for u in url_list]
+    with metrics.stage("fetch"):
+        for i, url_data, status in iter_parse_urls(
+            url_list,
+            user_agent,
+            exclude_tags_list,
+            max_workers=max_workers,
+            max_per_host=max_per_host,
+            deadline=deadline,
+            parse_workers=parse_workers,
+        ):
+            results[i] = url_data
+            if on_status:
+                on_status(status)
     return results
@@ -1,8 +1,169 @@
-from typing import Any, Dict, List
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-from core.ai_solver import analyze_results, create_new_page
-from core.parser import parse_url, parse_urls
-from core.semantic_analyzer import compute_semantics_gaps, compute_zone_relevance
+from core import metrics
+from core.ai_solver import (
+    LLM_MODE,
+    LLM_MODES,
+    analyze_results,
+    analyze_results_parallel,
+    analyze_results_parallel_stream,
+    analyze_results_stream,
+    bypass_llm_cache,
+    create_new_page,
+    create_new_page_stream,
+    get_openai_client,
+)
+from core.memo import fingerprint, get_stage_cache, memoize
+
+if TYPE_CHECKING:
+    from core.serp_profile import SerpProfile
+
+# Streamlit вызывает warm_up при каждом перезапуске скрипта, а фоновый прогрев
+# нужен один раз на процесс
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+
+def warm_up(background: bool = False) -> None:
+    """
+    Заранее загружает модель эмбеддингов и клиент LLM, чтобы первый анализ
+    не платил за их инициализацию. Повторный вызов ничего не делает.
+    """
+    global _warm_up_started
+    if background:
+        with _warm_up_lock:
+            if _warm_up_started:
+                return
+            _warm_up_started = True
+        threading.Thread(target=warm_up, name="textmind-warm-up", daemon=True).start()
+        return
+
+    from core.semantic_analyzer import get_model
+
+    get_model()
+    try:
+        get_openai_client()
+    except Exception as e:
+        print(f"Не удалось инициализировать клиент LLM: {e}")
+
+
+def _recommendation_solver(llm_mode: str, stream: bool) -> Callable[..., Any]:
+    if llm_mode not in LLM_MODES:
+        raise ValueError(f"Неизвестный режим рекомендаций {llm_mode!r}: {LLM_MODES}")
+    if llm_mode == "parallel":
+        return analyze_results_parallel_stream if stream else analyze_results_parallel
+    return analyze_results_stream if stream else analyze_results
+
+
+def fetch_and_embed(
+    my_doc: str,
+    competitors: List[str],
+    keywords: List[str],
+    user_agent: str,
+    exclude_tags_list: List[str],
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+    on_status: Optional[Callable[[Any], None]] = None,
+):
+    """
+    Загружает мою страницу и конкурентов потоком: каждая страница кодируется,
+    как только разобрана, пока остальные ещё загружаются. Возвращает
+    (MY_DOCUMENT, COMPETITORS, table) — таблица уже содержит всё нужное анализу.
+    """
+    from core.parser import iter_parse_urls
+    from core.semantic_analyzer import ZONES, EmbeddingTable, collect_texts, get_model
+
+    table = EmbeddingTable(get_model())
+    table.prefetch(keywords)
+
+    urls = [my_doc] + list(competitors)
+    docs = [None] * len(urls)
+    # Мою страницу пользователь мог только что поправить — всегда проверяем её
+    iterator = iter_parse_urls(urls, user_agent, exclude_tags_list, revalidate={my_doc})
+    for done, (i, doc, status) in enumerate(iterator, 1):
+        docs[i] = doc
+        if on_status:
+            on_status(status)
+        if on_progress:
+            on_progress("fetch", done, len(urls))
+        if i == 0:
+            table.prefetch(collect_texts([doc], ZONES, full=True))
+        else:
+            table.prefetch(collect_texts([doc], ZONES, items=True))
+    return docs[0], docs[1:], table
+
+
+def fetch_pages(
+    my_doc: str,
+    competitors: List[str],
+    keywords: List[str],
+    user_agent: str,
+    exclude_tags_list: List[str],
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+):
+    """
+    fetch_and_embed с запоминанием конкурентов: пока их страницы свежи
+    (HTTP_CACHE_TTL), те же URL с теми же настройками разбора не загружаются
+    и не разбираются. Моя страница загружается с проверкой каждый раз.
+    Конкуренты с незагрузившимися страницами не запоминаются
+    """
+    from core.cache import HTTP_CACHE_TTL, get_http_cache
+
+    cache = get_stage_cache()
+    if HTTP_CACHE_TTL <= 0 or get_http_cache() is None:
+        # Страницы не бывают свежими — каждый запуск проверяет их заново
+        cache = None
+    key = fingerprint(competitors, user_agent, exclude_tags_list)
+    COMPETITORS = cache.get("competitor_pages", key) if cache is not None else None
+    if COMPETITORS is not None:
+        metrics.incr("pages_cache_hits")
+        MY_DOCUMENT, _, table = fetch_and_embed(
+            my_doc, [], keywords, user_agent, exclude_tags_list, on_progress
+        )
+        return MY_DOCUMENT, COMPETITORS, table
+
+    failed = []
+
+    def on_status(status):
+        if status.status != "ok" and status.url != my_doc:
+            failed.append(status)
+
+    MY_DOCUMENT, COMPETITORS, table = fetch_and_embed(
+        my_doc,
+        competitors,
+        keywords,
+        user_agent,
+        exclude_tags_list,
+        on_progress,
+        on_status,
+    )
+    if cache is not None:
+        metrics.incr("pages_cache_misses")
+    if cache is not None and not failed:
+        cache.put("competitor_pages", key, COMPETITORS, ttl=HTTP_CACHE_TTL)
+    return MY_DOCUMENT, COMPETITORS, table
+
+
+def build_serp_profile(
+    competitors: List[str],
+    keywords: List[str],
+    user_agent: str,
+    exclude_tags_list: List[str],
+    path: Optional[str] = None,
+) -> "SerpProfile":
+    """
+    Загружает и кодирует конкурентов один раз; профиль можно передать в
+    analyze(profile=...) для любого числа моих страниц или сохранить в path (.npz).
+    """
+    from core.parser import parse_urls
+    from core.serp_profile import build_profile
+
+    with metrics.stage("fetch"):
+        COMPETITORS = parse_urls(competitors, user_agent, exclude_tags_list)
+    profile = build_profile(COMPETITORS, keywords)
+    if path:
+        profile.save(path)
+    return profile
 
 
 def analyze(
@@ -14,40 +175,262 @@ def analyze(
     temperatura: int,
     struct: bool,
     new_page: bool = False,
+    stream: bool = False,
+    profile: Optional["SerpProfile"] = None,
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+    llm_mode: str = LLM_MODE,
+    use_llm_cache: bool = True,
 ) -> Dict[str, Any]:
     """
     Анализ контента сайта или генерация новой страницы.
 
+    При stream=True вместо готового текста в "results" возвращается
+    CompletionStream, который отдаёт рекомендации по мере генерации.
+    С profile (см. build_serp_profile) конкуренты берутся из профиля:
+    competitors не загружаются и не кодируются заново.
+    on_progress(стадия, сделано, всего) сообщает о ходе анализа: fetch — по
+    странице, затем zone_relevance, gaps и llm.
+    llm_mode="parallel" запрашивает рекомендации по группам зон параллельно
+    и собирает их коротким итоговым запросом (см. LLM_MODES).
+    use_llm_cache=False запрашивает рекомендации заново, минуя кэш ответов LLM.
+    Страницы, профиль конкурентов, релевантность и разрывы запоминаются по
+    своим входам (core.memo): при смене ключей или настроек генерации
+    пересчитываются только зависящие от них стадии.
+
     Returns:
         dict:
             {
                 "new_page": bool,
-                "results": str,  # HTML или текст
+                "results": str | CompletionStream,  # HTML или текст
                 "zone_relevance": dict | None,
-                "semantics_gaps": dict | None
+                "semantics_gaps": dict | None,
+                "metrics": RunMetrics,  # время по стадиям и счётчики
             }
     """
-    COMPETITORS = parse_urls(competitors, user_agent, exclude_tags_list)
 
-    if new_page:
-        results = create_new_page(COMPETITORS, keywords, temperatura)
+    solver = _recommendation_solver(llm_mode, stream)
+
+    def report(stage, done=0, total=0):
+        if on_progress:
+            on_progress(stage, done, total)
+
+    with metrics.collect() as run_metrics, bypass_llm_cache(not use_llm_cache):
+        if new_page:
+            # Парсер импортируется при первом анализе, чтобы импорт пакета был быстрым
+            from core.parser import parse_urls
+
+            if profile is not None:
+                COMPETITORS = profile.competitors
+            else:
+                fetched = []
+
+                def on_status(status):
+                    fetched.append(status)
+                    report("fetch", len(fetched), len(competitors))
+
+                COMPETITORS = parse_urls(
+                    competitors, user_agent, exclude_tags_list, on_status=on_status
+                )
+            report("llm")
+
+            if stream:
+                results = create_new_page_stream(COMPETITORS, keywords, temperatura)
+            else:
+                results = create_new_page(COMPETITORS, keywords, temperatura)
+            return {
+                "new_page": True,
+                "results": results,
+                "zone_relevance": None,
+                "semantics_gaps": None,
+                "metrics": run_metrics,
+            }
+
+        # Модель эмбеддингов (и torch) нужна только для анализа существующей страницы
+        from core.dedup import DEDUP_METHOD
+        from core.semantic_analyzer import (
+            EmbeddingTable,
+            compute_semantics_gaps,
+            compute_zone_relevance,
+            get_model,
+        )
+        from core.serp_profile import build_profile
+
+        if profile is not None:
+            from core.parser import parse_url
+
+            MY_DOCUMENT = parse_url(
+                my_doc, user_agent, exclude_tags_list, revalidate=True
+            )
+            report("fetch", 1, 1)
+            COMPETITORS = profile.competitors
+            table = EmbeddingTable(get_model())
+            competitors_key = fingerprint(
+                profile.model_name, profile.created_at, profile.urls
+            )
+        else:
+            # Загрузка, разбор и кодирование страниц идут внахлёст, поэтому стадия
+            # fetch_embed включает и fetch, и parse, и embed; обе стадии анализа
+            # берут эмбеддинги из общей таблицы после прихода последней страницы
+            with metrics.stage("fetch_embed"):
+                MY_DOCUMENT, COMPETITORS, table = fetch_pages(
+                    my_doc,
+                    competitors,
+                    keywords,
+                    user_agent,
+                    exclude_tags_list,
+                    on_progress,
+                )
+            # Профиль конкурентов не зависит от ключей и настроек генерации,
+            # поэтому при их изменении берётся готовым
+            competitors_key = fingerprint(
+                getattr(table.model, "cache_name", None), DEDUP_METHOD, COMPETITORS
+            )
+            profile = memoize(
+                "profile",
+                competitors_key,
+                lambda: build_profile(COMPETITORS, table=table),
+            )
+
+        doc_key = fingerprint(MY_DOCUMENT)
+        report("zone_relevance")
+        zone_relevance = memoize(
+            "zone_relevance",
+            fingerprint(doc_key, competitors_key),
+            lambda: compute_zone_relevance(
+                MY_DOCUMENT, COMPETITORS, table=table, profile=profile
+            ),
+        )
+        report("gaps")
+        semantics_gaps = memoize(
+            "gaps",
+            fingerprint(doc_key, competitors_key, keywords),
+            lambda: compute_semantics_gaps(
+                MY_DOCUMENT, COMPETITORS, keywords, table=table, profile=profile
+            ),
+        )
+        report("llm")
+        results = solver(
+            MY_DOCUMENT, semantics_gaps, keywords, zone_relevance, temperatura, struct
+        )
+
         return {
-            "new_page": True,
+            "new_page": False,
             "results": results,
-            "zone_relevance": None,
-            "semantics_gaps": None,
+            "zone_relevance": zone_relevance,
+            "semantics_gaps": semantics_gaps,
+            "metrics": run_metrics,
         }
 
-    MY_DOCUMENT = parse_url(my_doc, user_agent, exclude_tags_list)
-    zone_relevance = compute_zone_relevance(MY_DOCUMENT, COMPETITORS)
-    semantics_gaps = compute_semantics_gaps(MY_DOCUMENT, COMPETITORS, keywords)
-    results = analyze_results(
-        MY_DOCUMENT, semantics_gaps, keywords, zone_relevance, temperatura, struct
+
+def audit(
+    my_docs: List[str],
+    competitors: List[str],
+    keywords: List[str],
+    user_agent: str,
+    exclude_tags_list: List[str],
+    temperatura: int,
+    struct: bool,
+    with_llm: bool = False,
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+    profile: Optional["SerpProfile"] = None,
+    llm_mode: str = LLM_MODE,
+    use_llm_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Аудит нескольких моих страниц против одного набора конкурентов.
+
+    Страницы и конкуренты загружаются параллельно, конкуренты кодируются один
+    раз в профиль выдачи (или берутся из profile), зоны всех моих страниц —
+    общими батчами; релевантность и разрывы для всех страниц считаются
+    матричными операциями. Рекомендации LLM по каждой странице — при with_llm.
+    on_progress(стадия, сделано, всего) вызывается после каждого шага.
+
+    Returns:
+        dict:
+            {
+                "pages": [
+                    {
+                        "url": str,
+                        "zone_relevance": dict,
+                        "semantics_gaps": dict,
+                        "results": str | None,  # рекомендации LLM
+                    },
+                    ...
+                ],
+                "metrics": RunMetrics,
+            }
+    """
+    from core.parser import iter_parse_urls
+    from core.semantic_analyzer import (
+        ZONES,
+        EmbeddingTable,
+        collect_texts,
+        compare_zones_batch,
+        find_semantic_gaps_batch,
+        get_model,
     )
+    from core.serp_profile import build_profile
+
+    urls = list(my_docs) + ([] if profile is not None else list(competitors))
+    solver = _recommendation_solver(llm_mode, stream=False)
+
+    def report(stage, done=0, total=0):
+        if on_progress:
+            on_progress(stage, done, total)
+
+    with metrics.collect() as run_metrics, bypass_llm_cache(not use_llm_cache):
+        if not my_docs:
+            # Сравнивать не с чем — конкурентов не загружаем
+            return {"pages": [], "metrics": run_metrics}
+
+        docs = [None] * len(urls)
+        with metrics.stage("fetch"):
+            iterator = iter_parse_urls(
+                urls, user_agent, exclude_tags_list, revalidate=set(my_docs)
+            )
+            for done, (i, doc, _) in enumerate(iterator, 1):
+                docs[i] = doc
+                report("fetch", done, len(urls))
+        MY_DOCUMENTS = docs[: len(my_docs)]
+
+        report("embed")
+        table = EmbeddingTable(get_model())
+        if profile is None:
+            profile = build_profile(docs[len(my_docs) :], keywords, table=table)
+        # Зоны и полные тексты всех моих страниц — одним батчем
+        table.prefetch(collect_texts(MY_DOCUMENTS, ZONES, full=True))
+
+        report("zone_relevance")
+        with metrics.stage("zone_relevance"):
+            zone_relevance = compare_zones_batch(
+                MY_DOCUMENTS, None, ZONES, table.model, table=table, profile=profile
+            )
+        report("gaps")
+        with metrics.stage("gaps"):
+            semantics_gaps = find_semantic_gaps_batch(
+                MY_DOCUMENTS,
+                None,
+                keywords,
+                ZONES,
+                table.model,
+                table=table,
+                profile=profile,
+            )
+        pages = []
+        for n, (doc, relevance, gaps) in enumerate(
+            zip(MY_DOCUMENTS, zone_relevance, semantics_gaps)
+        ):
+            results = None
+            if with_llm:
+                report("llm", n, len(MY_DOCUMENTS))
+                results = solver(doc, gaps, keywords, relevance, temperatura, struct)
+            pages.append(
+                {
+                    "url": doc.url,
+                    "zone_relevance": relevance,
+                    "semantics_gaps": gaps,
+                    "results": results,
+                }
+            )
 
-    return {
-        "new_page": False,
-        "results": results,
-        "zone_relevance": zone_relevance,
-        "semantics_gaps": semantics_gaps,
-    }
+        return {"pages": pages, "metrics": run_metrics}
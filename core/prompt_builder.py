@@ -0,0 +1,206 @@
+"""
+Упаковка документов в промпт LLM с ограничением по токенам.
+
+Сначала в промпт попадают самые информативные зоны (title, h1, slug, начало
+текста, подзаголовки), затем списки и ссылки. Внутри зоны элементы ранжируются
+по лексической близости к ключевым словам, повторы и сквозная навигация,
+встречающаяся у многих конкурентов, отбрасываются.
+"""
+
+import functools
+import math
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+DOC_TOKEN_BUDGET = 2000
+COMPETITORS_TOKEN_BUDGET = 8000
+CHARS_PER_TOKEN = 3  # грубая оценка для смешанного русского и английского текста
+
+# Порядок важности зон для промпта
+ZONE_PRIORITY = [
+    "title",
+    "h1",
+    "url_as_text",
+    "first_500_chars",
+    "subheadings",
+    "structures",
+    "hrefs",
+]
+HEADER_ZONES = {"title", "h1", "url_as_text"}
+LIST_ZONES = {"subheadings", "structures", "hrefs"}
+MAX_ITEM_CHARS = {"first_500_chars": 500}
+DEFAULT_MAX_ITEM_CHARS = 150
+MAX_ZONE_ITEMS = {"subheadings": 40, "structures": 30, "hrefs": 20}
+MIN_ITEM_CHARS = 3
+# Накладные расходы на кавычки, запятые и ключи в сериализованном dict
+ITEM_OVERHEAD_TOKENS = 2
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+@dataclass
+class PromptPayload:
+    data: Any
+    tokens: int
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding():
+    # Загружается при первом подсчёте, а не при импорте: tiktoken может
+    # скачивать словарь BPE по сети
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(count_tokens(m["content"]) + ITEM_OVERHEAD_TOKENS for m in messages)
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _terms(text: str) -> set:
+    # Обрезка до 5 символов — дешёвая замена стеммингу для русских словоформ
+    return {w[:5] for w in _WORD_RE.findall(text.lower()) if len(w) > 2}
+
+
+def keyword_score(text: str, keyword_terms: set) -> float:
+    if not keyword_terms:
+        return 0.0
+    terms = _terms(text)
+    if not terms:
+        return 0.0
+    return len(terms & keyword_terms) / len(terms)
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def find_boilerplate(docs: List[Dict[str, Any]]) -> set:
+    """Элементы ссылок и структур, повторяющиеся у большинства документов"""
+    if len(docs) < 2:
+        return set()
+    counts: Dict[str, int] = {}
+    for doc in docs:
+        seen = set()
+        for zone in ("hrefs", "structures"):
+            for item in doc.get(zone) or []:
+                seen.add(_norm(item))
+        for item in seen:
+            counts[item] = counts.get(item, 0) + 1
+    threshold = max(2, math.ceil(len(docs) / 2))
+    return {item for item, n in counts.items() if n >= threshold}
+
+
+def pack_documents(
+    docs: List[Any],
+    keywords: List[str],
+    budget: int,
+    exclude: tuple = ("word_count", "url", "text"),
+) -> PromptPayload:
+    """
+    Отбирает содержимое документов (URLData) в пределах budget токенов.
+
+    Возвращает список словарей в исходном порядке зон и фактическое число
+    токенов сериализованного результата.
+    """
+    raw = [
+        {k: v for k, v in asdict(doc).items() if k not in exclude and v} for doc in docs
+    ]
+    keyword_terms = _terms(" ".join(keywords))
+    boilerplate = find_boilerplate(raw)
+
+    # Кандидаты упорядочены так, что сначала берутся короткие зоны всех документов,
+    # затем по очереди лучшие элементы каждой зоны каждого документа: один
+    # документ или одна длинная зона не съедают весь бюджет
+    candidates = []
+    for doc_idx, doc in enumerate(raw):
+        for zone, value in doc.items():
+            if zone not in ZONE_PRIORITY:
+                continue
+            limit = MAX_ITEM_CHARS.get(zone, DEFAULT_MAX_ITEM_CHARS)
+            items = value if zone in LIST_ZONES else [value]
+            seen = set()
+            scored = []
+            for pos, item in enumerate(items):
+                key = _norm(str(item))
+                if len(key) < MIN_ITEM_CHARS or key in seen:
+                    continue
+                if zone in LIST_ZONES and key in boilerplate:
+                    continue
+                seen.add(key)
+                text = _truncate(str(item), limit)
+                scored.append((-keyword_score(text, keyword_terms), pos, text))
+            scored.sort()
+            tier = 0 if zone in HEADER_ZONES else 1
+            for rank, (neg_score, _, text) in enumerate(scored):
+                candidates.append(
+                    (
+                        tier,
+                        rank,
+                        ZONE_PRIORITY.index(zone),
+                        neg_score,
+                        doc_idx,
+                        zone,
+                        text,
+                    )
+                )
+    candidates.sort()
+
+    packed: List[Dict[str, Any]] = [{} for _ in raw]
+    zone_counts: Dict[tuple, int] = {}
+    remaining = budget
+    for *_, doc_idx, zone, text in candidates:
+        if zone in LIST_ZONES:
+            if zone_counts.get((doc_idx, zone), 0) >= MAX_ZONE_ITEMS[zone]:
+                continue
+        cost = count_tokens(text) + ITEM_OVERHEAD_TOKENS
+        if cost > remaining:
+            continue
+        remaining -= cost
+        if zone in LIST_ZONES:
+            zone_counts[(doc_idx, zone)] = zone_counts.get((doc_idx, zone), 0) + 1
+            packed[doc_idx].setdefault(zone, []).append(text)
+        else:
+            packed[doc_idx][zone] = text
+
+    # Возвращаем исходный порядок зон документа
+    data = [
+        {zone: packed[i][zone] for zone in raw[i] if zone in packed[i]}
+        for i in range(len(raw))
+    ]
+    return PromptPayload(data=data, tokens=count_tokens(str(data)))
+
+
+def round_scores(value: Any, digits: int = 3) -> Any:
+    """Округляет метрики близости, чтобы не тратить токены на лишние знаки"""
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, dict):
+        return {k: round_scores(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [round_scores(v, digits) for v in value]
+    return value
+
+
+def pack_document(
+    doc: Any, keywords: List[str], budget: int = DOC_TOKEN_BUDGET
+) -> PromptPayload:
+    payload = pack_documents([doc], keywords, budget)
+    return PromptPayload(data=payload.data[0], tokens=payload.tokens)
@@ -0,0 +1,60 @@
+"""Общий для процесса реестр тяжёлых ресурсов (модели, клиенты, кэши).
+
+Ресурс создаётся фабрикой при первом обращении и дальше переиспользуется всеми
+сессиями и потоками. Загрузка разных ресурсов идёт параллельно, один и тот же
+ресурс создаётся ровно один раз.
+"""
+
+import threading
+
+_factories = {}
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, factory, replace=False):
+    """
+    Регистрирует фабрику ресурса.
+
+    Модули регистрируют фабрики по умолчанию при импорте; чтобы подменить ресурс
+    (заглушка в бенчмарке, другой бэкенд), нужно передать replace=True — тогда уже
+    созданный экземпляр сбрасывается. Без replace существующая фабрика сохраняется.
+    """
+    with _registry_lock:
+        if name in _factories and not replace:
+            return
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+        _instances.pop(name, None)
+
+
+def get(name):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    with _registry_lock:
+        if name not in _factories:
+            raise KeyError(f"Ресурс {name!r} не зарегистрирован")
+        lock = _locks[name]
+
+    with lock:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _factories[name]()
+            _instances[name] = instance
+    return instance
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def reset(name=None):
+    """Сбрасывает созданные экземпляры, чтобы фабрики вызвались заново"""
+    with _registry_lock:
+        if name is None:
+            _instances.clear()
+        else:
+            _instances.pop(name, None)
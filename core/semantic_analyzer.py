@@ -1,12 +1,16 @@
+import os
 import re
 
 import torch
 from sentence_transformers import SentenceTransformer, util
 
-# Загружаем модель
-MODEL = SentenceTransformer(
-    "paraphrase-multilingual-MiniLM-L12-v2"
-)  # paraphrase-multilingual-mpnet-base-v2
+from core import metrics, registry
+from core.cache import get_embedding_cache
+from core.dedup import DEDUP_METHOD, group_items, merge_similar
+from core.embedding_service import EMBED_MAX_BATCH, EmbeddingService
+
+# Альтернатива: paraphrase-multilingual-mpnet-base-v2
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 ZONES = [
     "title",
     "h1",
@@ -19,175 +23,625 @@ ZONES = [
 ]
 
 
+# torch — fp32, torch-int8 — динамическая int8-квантизация линейных слоёв,
+# onnx — ONNX Runtime (нужен пакет optimum[onnxruntime])
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx")
+EMBEDDING_BACKEND = os.getenv("TEXTMIND_EMBEDDING_BACKEND", "torch")
+# Как сводить близость элемента к набору ключей: лучший ключ, среднее по всем
+# или среднее по KEYWORD_TOP_K лучшим
+KEYWORD_AGGREGATIONS = ("max", "mean", "topk")
+KEYWORD_TOP_K = 3
+# Перекрытие соседних чанков длинного текста, в токенах
+CHUNK_OVERLAP = int(os.getenv("TEXTMIND_CHUNK_OVERLAP", "32"))
+# Потоков на одну операцию модели; 0 — по умолчанию библиотеки
+EMBEDDING_THREADS = int(os.getenv("TEXTMIND_EMBEDDING_THREADS", "0"))
+# Файл модели в репозитории, например onnx/model_qint8_avx512_vnni.onnx
+ONNX_FILE_NAME = os.getenv("TEXTMIND_ONNX_FILE")
+
+
+def load_model(backend=EMBEDDING_BACKEND, threads=EMBEDDING_THREADS, name=MODEL_NAME):
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Неизвестный бэкенд эмбеддингов {backend!r}, доступны: {EMBEDDING_BACKENDS}"
+        )
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    if backend == "onnx":
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        model_kwargs = {"session_options": options}
+        if ONNX_FILE_NAME:
+            model_kwargs["file_name"] = ONNX_FILE_NAME
+        model = SentenceTransformer(
+            name, device="cpu", backend="onnx", model_kwargs=model_kwargs
+        )
+    else:
+        model = SentenceTransformer(name, device="cpu" if backend != "torch" else None)
+        if backend == "torch-int8":
+            torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+
+    # Имя, под которым эмбеддинги модели хранятся в кэше: векторы разных
+    # бэкендов немного различаются и не должны смешиваться
+    model.cache_name = name if backend == "torch" else f"{name}@{backend}"
+    if backend == "onnx" and ONNX_FILE_NAME:
+        model.cache_name += f":{ONNX_FILE_NAME}"
+    model.backend_name = backend
+    return model
+
+
+def _load_model():
+    return load_model()
+
+
+def _create_embedding_service():
+    return EmbeddingService(registry.get("embedding_model"))
+
+
+registry.register("embedding_model", _load_model)
+registry.register("embedding_service", _create_embedding_service)
+
+
+def get_model():
+    """
+    Модель загружается при первом обращении и общая для всего процесса.
+    Запросы кодирования всех анализов объединяются в батчи сервисом эмбеддингов
+    """
+    if EMBED_MAX_BATCH > 0:
+        return registry.get("embedding_service")
+    return registry.get("embedding_model")
+
+
 def normalize_text(text):
     text = text.lower().strip()
     text = re.sub(r"\s+", " ", text)
     return text
 
 
-def chunk_text(text, max_tokens=200):
+def chunk_text(text, max_tokens=200, overlap=0):
     words = text.split()
-    for i in range(0, len(words), max_tokens):
+    step = max(1, max_tokens - overlap)
+    for i in range(0, len(words), step):
         yield " ".join(words[i : i + max_tokens])
+        if i + max_tokens >= len(words):
+            break
+
+
+def zone_to_text(value):
+    if isinstance(value, list):
+        return " ".join(value)
+    return str(value)
+
+
+def _model_window(model, max_tokens):
+    """Сколько токенов текста модель видит за раз (без служебных токенов)"""
+    tokenizer = model.tokenizer
+    limit = getattr(model, "max_seq_length", None) or tokenizer.model_max_length
+    limit = min(limit, 512) - tokenizer.num_special_tokens_to_add()
+    return max(1, min(max_tokens, limit))
+
+
+def _token_chunks(texts, model, max_tokens, overlap):
+    """Режет тексты по токенам токенизатора модели, чтобы модель не обрезала чанки"""
+    window = _model_window(model, max_tokens)
+    step = max(1, window - overlap)
+    offsets = model.tokenizer(
+        texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+    )["offset_mapping"]
+
+    pieces, owners, lengths = [], [], []
+    for i, (text, spans) in enumerate(zip(texts, offsets)):
+        if len(spans) <= window:
+            pieces.append(text)
+            owners.append(i)
+            lengths.append(max(1, len(spans)))
+            continue
+        for start in range(0, len(spans), step):
+            chunk = spans[start : start + window]
+            # Границы чанка берём из смещений токенов в исходном тексте
+            pieces.append(text[chunk[0][0] : chunk[-1][1]])
+            owners.append(i)
+            lengths.append(len(chunk))
+            if start + window >= len(spans):
+                break
+    return pieces, owners, lengths
+
+
+def _word_chunks(texts, max_tokens, overlap):
+    """Запасной вариант для моделей без токенизатора: чанки по словам"""
+    pieces, owners, lengths = [], [], []
+    for i, text in enumerate(texts):
+        if len(text.split()) > max_tokens:
+            chunks = list(chunk_text(text, max_tokens, overlap))
+        else:
+            chunks = [text]
+        pieces.extend(chunks)
+        owners.extend([i] * len(chunks))
+        lengths.extend(max(1, len(chunk.split())) for chunk in chunks)
+    return pieces, owners, lengths
+
+
+def _encode_bucketed(pieces, lengths, model, batch_size):
+    """Кодирует фрагменты батчами близкой длины, чтобы не тратиться на паддинг"""
+    order = sorted(range(len(pieces)), key=lengths.__getitem__)
+    parts = [
+        model.encode(
+            [pieces[j] for j in order[k : k + batch_size]],
+            convert_to_tensor=True,
+            batch_size=batch_size,
+        )
+        for k in range(0, len(order), batch_size)
+    ]
+    embeddings = torch.cat(parts)
+    result = torch.empty_like(embeddings)
+    result[torch.tensor(order, device=embeddings.device)] = embeddings
+    return result
+
+
+def _encode_chunked(texts, model, max_tokens, batch_size, overlap=CHUNK_OVERLAP):
+    if getattr(model, "tokenizer", None) is not None:
+        pieces, owners, lengths = _token_chunks(texts, model, max_tokens, overlap)
+    else:
+        pieces, owners, lengths = _word_chunks(texts, max_tokens, overlap)
+
+    metrics.incr("encode_calls")
+    metrics.incr("sentences_encoded", len(pieces))
+    with metrics.stage("embed"):
+        if getattr(model, "tokenizer", None) is not None:
+            embeddings = _encode_bucketed(pieces, lengths, model, batch_size)
+        else:
+            embeddings = model.encode(
+                pieces, convert_to_tensor=True, batch_size=batch_size
+            )
+
+    # Вектор текста — среднее его чанков, взвешенное по длине в токенах
+    owners = torch.tensor(owners, device=embeddings.device)
+    weights = torch.tensor(
+        lengths, dtype=embeddings.dtype, device=embeddings.device
+    ).unsqueeze(1)
+    sums = torch.zeros(
+        (len(texts), embeddings.shape[1]),
+        dtype=embeddings.dtype,
+        device=embeddings.device,
+    )
+    sums.index_add_(0, owners, embeddings * weights)
+    totals = torch.zeros(
+        (len(texts), 1), dtype=embeddings.dtype, device=embeddings.device
+    )
+    totals.index_add_(0, owners, weights)
+    return sums / totals
+
+
+def encode_texts(texts, model, max_tokens=200, batch_size=64, overlap=CHUNK_OVERLAP):
+    """Батчевое кодирование списка текстов: повторы и тексты из кэша не кодируются,
+    длинные тексты режутся на чанки по токенам модели с перекрытием overlap,
+    все фрагменты кодируются за один проход батчами близкой длины"""
+    texts = [normalize_text(text) for text in texts]
+    unique = list(dict.fromkeys(texts))
+
+    cache = get_embedding_cache()
+    model_name = getattr(model, "cache_name", None)
+    use_cache = cache is not None and model_name is not None
+    if use_cache:
+        # Вектор длинного текста зависит от нарезки на чанки
+        model_name = f"{model_name}|chunks={max_tokens}/{overlap}"
+    device = getattr(model, "device", "cpu")
+
+    vectors = {}
+    if use_cache:
+        for text, emb in cache.get_many(model_name, unique).items():
+            vectors[text] = torch.from_numpy(emb.copy()).to(device)
+        metrics.incr("embedding_cache_hits", len(vectors))
+        metrics.incr("embedding_cache_misses", len(unique) - len(vectors))
+
+    missing = [text for text in unique if text not in vectors]
+    if missing:
+        fresh = _encode_chunked(missing, model, max_tokens, batch_size, overlap)
+        if use_cache:
+            cache.put_many(
+                model_name,
+                {text: emb.cpu().numpy() for text, emb in zip(missing, fresh)},
+            )
+        vectors.update(zip(missing, fresh))
+
+    return torch.stack([vectors[text] for text in texts])
 
 
 def embed_long_text(text, model, max_tokens=200):
-    chunks = list(chunk_text(text, max_tokens))
-    embeddings = model.encode(chunks, convert_to_tensor=True)
-    return embeddings.mean(dim=0)  # усредняем чанки в один вектор
+    return encode_texts([text], model, max_tokens)[0]
 
 
-def get_zone_embeddings(docs, zone, model, max_tokens=200):
+def doc_zone_text(doc, zone):
+    value = getattr(doc, zone, None)
+    if not value:
+        return None
+    return normalize_text(zone_to_text(value))
+
+
+def doc_zone_items(doc, zone):
+    value = getattr(doc, zone, None)
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    return [normalize_text(item) for item in value]
+
+
+def doc_full_text(doc, zones):
+    return " ".join(t for t in (doc_zone_text(doc, zone) for zone in zones) if t)
+
+
+def collect_texts(docs, zones, zone_texts=True, items=False, full=False):
+    """Все тексты документов, которые понадобятся анализу, для одного батча"""
+    texts = []
+    for doc in docs:
+        for zone in zones:
+            if zone_texts:
+                text = doc_zone_text(doc, zone)
+                if text:
+                    texts.append(text)
+            if items:
+                # Кодируются сами элементы: представитель группы дублей — один из них
+                texts.extend(doc_zone_items(doc, zone))
+        if full:
+            texts.append(doc_full_text(doc, zones))
+    return texts
+
+
+class EmbeddingTable:
+    """
+    Эмбеддинги одного анализа.
+
+    Ключом служит нормализованный текст, поэтому зона документа, элемент зоны
+    или набор ключей кодируются не больше одного раза за запуск, какая бы
+    функция их ни запросила. Недостающие тексты кодируются одним батчем.
+    """
+
+    def __init__(self, model, max_tokens=200, overlap=CHUNK_OVERLAP):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self._vectors = {}
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def prefetch(self, texts):
+        missing = list(
+            dict.fromkeys(
+                text for text in map(normalize_text, texts) if text not in self._vectors
+            )
+        )
+        if missing:
+            embeddings = encode_texts(
+                missing, self.model, self.max_tokens, overlap=self.overlap
+            )
+            self._vectors.update(zip(missing, embeddings))
+
+    def add(self, texts, embeddings):
+        """Добавляет уже посчитанные эмбеддинги, например из профиля выдачи"""
+        for text, emb in zip(texts, embeddings):
+            self._vectors.setdefault(normalize_text(text), emb)
+
+    def embed(self, texts):
+        texts = [normalize_text(text) for text in texts]
+        self.prefetch(texts)
+        return torch.stack([self._vectors[text] for text in texts])
+
+    def zone_embedding(self, doc, zone):
+        text = doc_zone_text(doc, zone)
+        if text is None:
+            return None
+        return self.embed([text])[0]
+
+    def full_embedding(self, doc, zones):
+        return self.embed([doc_full_text(doc, zones)])[0]
+
+
+def get_zone_embeddings(docs, zone, model, max_tokens=200, table=None):
     """Считает эмбеддинги для конкретной зоны (например 'h1', 'title') с учетом длинных текстов"""
-    embeddings = []
-    for d in docs:
-        value = getattr(d, zone, None)
-        if not value:
-            continue
-
-        if isinstance(value, list):
-            text = " ".join(value)
-        else:
-            text = str(value)
-
-        text = normalize_text(text)
-
-        if len(text.split()) > max_tokens:
-            emb = embed_long_text(text, model, max_tokens)
-        else:
-            emb = model.encode(text, convert_to_tensor=True)
+    texts = [text for text in (doc_zone_text(d, zone) for d in docs) if text]
+    if not texts:
+        return None
+    if table is None:
+        table = EmbeddingTable(model, max_tokens)
+    return table.embed(texts)
 
-        embeddings.append(emb)
 
-    if not embeddings:
-        return None
-    return torch.stack(embeddings)
+def _zone_matrix(docs, zone, table):
+    """Эмбеддинги зоны для документов, где она есть: (индексы документов, матрица)"""
+    texts = [doc_zone_text(doc, zone) for doc in docs]
+    present = [i for i, text in enumerate(texts) if text]
+    if not present:
+        return present, None
+    return present, table.embed([texts[i] for i in present])
 
 
-def compare_zones(my_doc, competitors, zones, model, max_tokens=200):
-    results = {}
+def compare_zones_batch(
+    my_docs, competitors, zones, model, max_tokens=200, table=None, profile=None
+):
+    """
+    Зональная релевантность сразу для нескольких моих страниц: по зоне считается
+    одно матричное произведение [страницы × среднее конкурентов].
+    Возвращает список словарей в порядке my_docs.
+    """
+    if table is None:
+        table = EmbeddingTable(model, max_tokens)
+    if profile is not None:
+        profile.check_model(model)
+        docs = list(my_docs)
+    else:
+        docs = list(my_docs) + list(competitors)
+    table.prefetch(collect_texts(docs, zones))
+
+    results = [{} for _ in my_docs]
     for zone in zones:
         # Эмбеддинги конкурентов
-        comp_embeds = get_zone_embeddings(competitors, zone, model, max_tokens)
-        if comp_embeds is None:
-            continue
-        comp_mean = comp_embeds.mean(dim=0)
-
-        # Эмбеддинг моего документа
-        my_value = getattr(my_doc, zone, 0.0)
-        if not my_value:
-            continue
-
-        if isinstance(my_value, list):
-            my_text = " ".join(my_value)
+        if profile is not None:
+            comp_mean = profile.zone_means.get(zone)
+            if comp_mean is None:
+                continue
         else:
-            my_text = str(my_value)
-
-        my_text = normalize_text(my_text)
+            comp_embeds = get_zone_embeddings(
+                competitors, zone, model, max_tokens, table
+            )
+            if comp_embeds is None:
+                continue
+            comp_mean = comp_embeds.mean(dim=0)
 
-        if len(my_text.split()) > max_tokens:
-            my_embed = embed_long_text(my_text, model, max_tokens)
-        else:
-            my_embed = model.encode(my_text, convert_to_tensor=True)
+        # Эмбеддинги моих документов, у которых есть эта зона
+        present, my_embeds = _zone_matrix(my_docs, zone, table)
+        if my_embeds is None:
+            continue
 
         # Косинусная близость
-        sim = util.cos_sim(my_embed, comp_mean).item()
-        results[zone] = sim
+        sims = util.cos_sim(my_embeds, comp_mean).squeeze(1).tolist()
+        for i, sim in zip(present, sims):
+            results[i][zone] = sim
     return results
 
 
-def compute_zone_relevance(MY_DOCUMENT, TOP_COMPETITORS, zones=ZONES, model=MODEL):
+def compare_zones(
+    my_doc, competitors, zones, model, max_tokens=200, table=None, profile=None
+):
+    """
+    Близость зон моего документа к средним эмбеддингам зон конкурентов.
+    С profile (см. core.serp_profile) средние берутся из профиля, competitors не нужны.
+    """
+    return compare_zones_batch(
+        [my_doc], competitors, zones, model, max_tokens, table, profile
+    )[0]
+
+
+def compute_zone_relevance(
+    MY_DOCUMENT, TOP_COMPETITORS, zones=ZONES, model=None, table=None, profile=None
+):
+    if model is None:
+        model = table.model if table is not None else get_model()
     # Считаем релевантность
-    zone_relevance = compare_zones(MY_DOCUMENT, TOP_COMPETITORS, zones, model)
+    with metrics.stage("zone_relevance"):
+        zone_relevance = compare_zones(
+            MY_DOCUMENT, TOP_COMPETITORS, zones, model, table=table, profile=profile
+        )
     return zone_relevance
 
 
-def find_semantic_gaps(
-    my_doc, competitors, keywords, zones, model, max_tokens=200, top_n=3, min_sim=0.3
+def keyword_scores(embeds, keyword_embeds, aggregation="max", k=KEYWORD_TOP_K):
+    """
+    Близость каждого вектора embeds к набору ключей одним матричным произведением.
+    Возвращает (оценки, индексы самых близких ключей).
+    """
+    if aggregation not in KEYWORD_AGGREGATIONS:
+        raise ValueError(
+            f"Неизвестная агрегация {aggregation!r}, доступны: {KEYWORD_AGGREGATIONS}"
+        )
+    sims = util.cos_sim(embeds, keyword_embeds)
+    best_sim, best = sims.max(dim=1)
+    if aggregation == "max":
+        return best_sim, best
+    if aggregation == "mean":
+        return sims.mean(dim=1), best
+    return torch.topk(sims, min(k, sims.shape[1]), dim=1).values.mean(dim=1), best
+
+
+def competitor_item_groups(competitors, zone, table, dedup=DEDUP_METHOD):
+    """
+    Элементы зоны всех конкурентов со схлопнутыми повторами и их эмбеддинги.
+    Возвращает (группы, матрица эмбеддингов) или None, если элементов нет.
+    """
+    items = [
+        (competitor.url, item)
+        for competitor in competitors
+        for item in doc_zone_items(competitor, zone)
+    ]
+    if not items:
+        return None
+    groups = group_items(items, dedup)
+
+    item_embeds = table.embed([group.text for group in groups])
+    if dedup == "embedding":
+        similarity = util.cos_sim(item_embeds, item_embeds).cpu().numpy()
+        groups = merge_similar(groups, similarity)
+        item_embeds = table.embed([group.text for group in groups])
+    metrics.incr("items_deduplicated", len(items) - len(groups))
+    return groups, item_embeds
+
+
+def find_semantic_gaps_batch(
+    my_docs,
+    competitors,
+    keywords,
+    zones,
+    model,
+    max_tokens=200,
+    top_n=3,
+    min_sim=0.3,
+    table=None,
+    dedup=DEDUP_METHOD,
+    aggregation="max",
+    top_k=KEYWORD_TOP_K,
+    profile=None,
 ):
-    # Эмбеддинг ключей
-    keywords_embedding = model.encode(" ".join(keywords), convert_to_tensor=True)
-
-    # Эмбеддинг всего текста моего документа
-    my_full_text = []
+    """
+    Семантические разрывы сразу для нескольких моих страниц.
+
+    Отбор элементов конкурентов по ключам от моих страниц не зависит и делается
+    один раз на зону; на каждую страницу приходятся только строки матриц
+    близости к её зоне и полному тексту. Возвращает список в порядке my_docs.
+    """
+    if not keywords:
+        return [{zone: [] for zone in zones} for _ in my_docs]
+    if table is None:
+        table = EmbeddingTable(model, max_tokens)
+
+    # Ключи, зоны и полный текст моих документов, элементы конкурентов — одним батчем
+    texts = list(keywords) + collect_texts(my_docs, zones, full=True)
+    if profile is None:
+        texts += collect_texts(competitors, zones, zone_texts=False, items=True)
+    else:
+        profile.seed(table)
+    table.prefetch(texts)
+
+    # Матрица эмбеддингов ключей: по строке на ключ
+    keyword_embeds = table.embed(keywords)
+    # Эмбеддинги полного текста моих документов
+    my_full_embeds = table.embed([doc_full_text(doc, zones) for doc in my_docs])
+
+    results = [{} for _ in my_docs]
     for zone in zones:
-        val = getattr(my_doc, zone, None)
-        if val:
-            if isinstance(val, list):
-                my_full_text.append(" ".join(val))
-            else:
-                my_full_text.append(str(val))
-    my_full_text = normalize_text(" ".join(my_full_text))
-    my_full_emb = (
-        embed_long_text(my_full_text, model, max_tokens)
-        if len(my_full_text.split()) > max_tokens
-        else model.encode(my_full_text, convert_to_tensor=True)
-    )
+        # Все элементы зоны у всех конкурентов без повторов
+        if profile is not None:
+            zone_items = profile.items.get(zone)
+        else:
+            zone_items = competitor_item_groups(competitors, zone, table, dedup)
+        if zone_items is None:
+            for result in results:
+                result[zone] = []
+            continue
+        groups, item_embeds = zone_items
+
+        keywords_sim, best_keyword = keyword_scores(
+            item_embeds, keyword_embeds, aggregation, top_k
+        )
+        candidates = torch.nonzero(keywords_sim >= min_sim).squeeze(1)
+        if candidates.numel() == 0:
+            for result in results:
+                result[zone] = []
+            continue
 
-    results = {}
-    for zone in zones:
-        zone_items = []
-        for competitor in competitors:
-            zone_value = getattr(competitor, zone, None)
-            if not zone_value:
-                continue
-            if isinstance(zone_value, str):
-                zone_value = [zone_value]
-
-            for item in zone_value:
-                item_text = normalize_text(item)
-                item_emb = (
-                    embed_long_text(item_text, model, max_tokens)
-                    if len(item_text.split()) > max_tokens
-                    else model.encode(item_text, convert_to_tensor=True)
-                )
-                keywords_sim = util.cos_sim(item_emb, keywords_embedding).item()
-                if keywords_sim >= min_sim:
-                    # Сравнение с зоной моего документа
-                    my_zone_value = getattr(my_doc, zone, None)
-                    if my_zone_value:
-                        if isinstance(my_zone_value, list):
-                            my_zone_text = " ".join(my_zone_value)
-                        else:
-                            my_zone_text = str(my_zone_value)
-                        my_zone_text = normalize_text(my_zone_text)
-                        my_zone_emb = (
-                            embed_long_text(my_zone_text, model, max_tokens)
-                            if len(my_zone_text.split()) > max_tokens
-                            else model.encode(my_zone_text, convert_to_tensor=True)
-                        )
-                        my_doc_sim_zone = util.cos_sim(item_emb, my_zone_emb).item()
-                        my_zone_kw_sim = util.cos_sim(
-                            my_zone_emb, keywords_embedding
-                        ).item()
-                    else:
-                        my_doc_sim_zone = 0.0
-
-                    # Сравнение с полным текстом документа
-                    my_doc_sim_full = util.cos_sim(item_emb, my_full_emb).item()
-
-                    zone_items.append(
-                        {
-                            "competitor": competitor.url,
-                            "item": item_text,
-                            "keywords_sim": keywords_sim,
-                            "my_doc_kw_sim": my_zone_kw_sim,
-                            "my_doc_sim_zone": my_doc_sim_zone,
-                            "my_doc_sim_full": my_doc_sim_full,
-                        }
-                    )
         # Берём топ-N элементов по релевантности ключам
-        zone_items.sort(key=lambda x: x["keywords_sim"], reverse=True)
-        results[zone] = zone_items[:top_n]
+        k = min(top_n, candidates.numel())
+        top = candidates[torch.topk(keywords_sim[candidates], k).indices]
+        top_embeds = item_embeds[top]
+
+        # Сравнение с зоной моих документов; у кого зоны нет — нули
+        sim_zone = torch.zeros((len(my_docs), k), device=top_embeds.device)
+        zone_kw_sim = torch.zeros(len(my_docs), device=top_embeds.device)
+        present, my_zone_embeds = _zone_matrix(my_docs, zone, table)
+        if my_zone_embeds is not None:
+            sim_zone[present] = util.cos_sim(my_zone_embeds, top_embeds)
+            zone_kw_sim[present] = keyword_scores(
+                my_zone_embeds, keyword_embeds, aggregation, top_k
+            )[0]
+
+        # Сравнение с полным текстом документов
+        sim_full = util.cos_sim(my_full_embeds, top_embeds).tolist()
+        sim_zone = sim_zone.tolist()
+        zone_kw_sim = zone_kw_sim.tolist()
+
+        shared = [
+            {
+                "competitor": groups[idx].sources[0],
+                "competitors": groups[idx].sources,
+                "item": groups[idx].text,
+                "keywords_sim": keywords_sim[idx].item(),
+                "best_keyword": keywords[best_keyword[idx]],
+            }
+            for idx in top.tolist()
+        ]
+        for i, result in enumerate(results):
+            result[zone] = [
+                {
+                    **item,
+                    "my_doc_kw_sim": zone_kw_sim[i],
+                    "my_doc_sim_zone": sim_zone[i][pos],
+                    "my_doc_sim_full": sim_full[i][pos],
+                }
+                for pos, item in enumerate(shared)
+            ]
 
     return results
 
 
+def find_semantic_gaps(
+    my_doc,
+    competitors,
+    keywords,
+    zones,
+    model,
+    max_tokens=200,
+    top_n=3,
+    min_sim=0.3,
+    table=None,
+    dedup=DEDUP_METHOD,
+    aggregation="max",
+    top_k=KEYWORD_TOP_K,
+    profile=None,
+):
+    """
+    Элементы зон конкурентов, близкие к ключам, но слабо представленные у меня.
+
+    Повторы элементов (у одного или разных конкурентов) схлопываются до
+    кодирования способом dedup; в результате для элемента указаны все
+    конкуренты, у которых он встречается. Каждый ключ кодируется отдельно,
+    близость к набору ключей сводится агрегацией aggregation (max, mean, topk),
+    best_keyword — ключ, которому элемент соответствует лучше всего.
+    С profile элементы конкурентов и их эмбеддинги берутся из профиля выдачи.
+    """
+    return find_semantic_gaps_batch(
+        [my_doc],
+        competitors,
+        keywords,
+        zones,
+        model,
+        max_tokens,
+        top_n,
+        min_sim,
+        table,
+        dedup,
+        aggregation,
+        top_k,
+        profile,
+    )[0]
+
+
 def compute_semantics_gaps(
-    MY_DOCUMENT, TOP_COMPETITORS, keyword_list, zones=ZONES, model=MODEL
+    MY_DOCUMENT,
+    TOP_COMPETITORS,
+    keyword_list,
+    zones=ZONES,
+    model=None,
+    table=None,
+    aggregation="max",
+    profile=None,
 ):
+    if model is None:
+        model = table.model if table is not None else get_model()
     # Считаем релевантность
-    semantic_gaps = find_semantic_gaps(
-        MY_DOCUMENT, TOP_COMPETITORS, keyword_list, zones, model
-    )
+    with metrics.stage("gaps"):
+        semantic_gaps = find_semantic_gaps(
+            MY_DOCUMENT,
+            TOP_COMPETITORS,
+            keyword_list,
+            zones,
+            model,
+            table=table,
+            aggregation=aggregation,
+            profile=profile,
+        )
     return semantic_gaps
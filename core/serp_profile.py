@@ -0,0 +1,146 @@
+"""
+Профиль выдачи (SERP): всё, что анализу нужно от набора конкурентов.
+
+Профиль строится один раз по загруженным конкурентам и хранит средние
+эмбеддинги зон, матрицы эмбеддингов элементов зон с провенансом, эмбеддинги
+ключей и разобранные документы. Сохраняется в .npz; compute_zone_relevance и
+compute_semantics_gaps с profile= работают без сети и без кодирования
+конкурентов — кодируется только моя страница.
+"""
+
+import json
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import torch
+
+from core import metrics
+from core.dedup import DEDUP_METHOD, ItemGroup
+from core.parser import URLData
+from core.semantic_analyzer import (
+    ZONES,
+    EmbeddingTable,
+    collect_texts,
+    competitor_item_groups,
+    get_model,
+    get_zone_embeddings,
+)
+
+PROFILE_VERSION = 2  # 2 — эмбеддинги элементов по тексту представителя группы
+
+
+@dataclass
+class SerpProfile:
+    model_name: str
+    zones: list
+    competitors: list  # URLData конкурентов
+    zone_means: dict = field(default_factory=dict)  # зона -> вектор
+    items: dict = field(default_factory=dict)  # зона -> (группы, матрица)
+    keywords: list = field(default_factory=list)
+    keyword_embeds: torch.Tensor | None = None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def urls(self):
+        return [doc.url for doc in self.competitors]
+
+    def seed(self, table):
+        """Кладёт эмбеддинги ключей профиля в таблицу анализа"""
+        self.check_model(table.model)
+        if self.keyword_embeds is not None:
+            table.add(self.keywords, self.keyword_embeds)
+
+    def check_model(self, model):
+        name = getattr(model, "cache_name", None)
+        if name is not None and name != self.model_name:
+            raise ValueError(
+                f"Профиль построен моделью {self.model_name!r}, а анализ идёт моделью {name!r}"
+            )
+
+    def save(self, path):
+        """Сохраняет профиль в несжатый .npz: векторы float32 и метаданные в JSON"""
+        meta = {
+            "version": PROFILE_VERSION,
+            "model_name": self.model_name,
+            "zones": self.zones,
+            "created_at": self.created_at,
+            "competitors": [asdict(doc) for doc in self.competitors],
+            "keywords": self.keywords,
+            "items": {
+                zone: [asdict(group) for group in groups]
+                for zone, (groups, _) in self.items.items()
+            },
+        }
+        arrays = {"meta": np.array(json.dumps(meta, ensure_ascii=False))}
+        for zone, mean in self.zone_means.items():
+            arrays[f"mean__{zone}"] = mean.cpu().numpy().astype(np.float32)
+        for zone, (_, embeds) in self.items.items():
+            arrays[f"items__{zone}"] = embeds.cpu().numpy().astype(np.float32)
+        if self.keyword_embeds is not None:
+            arrays["keywords"] = self.keyword_embeds.cpu().numpy().astype(np.float32)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path, device="cpu"):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != PROFILE_VERSION:
+                raise ValueError(f"Неподдерживаемая версия профиля {meta['version']}")
+
+            def tensor(name):
+                return torch.from_numpy(data[name]).to(device)
+
+            zone_means = {
+                zone: tensor(f"mean__{zone}")
+                for zone in meta["zones"]
+                if f"mean__{zone}" in data.files
+            }
+            items = {
+                zone: (
+                    [ItemGroup(**group) for group in groups],
+                    tensor(f"items__{zone}"),
+                )
+                for zone, groups in meta["items"].items()
+            }
+            keyword_embeds = tensor("keywords") if "keywords" in data.files else None
+
+        return cls(
+            model_name=meta["model_name"],
+            zones=meta["zones"],
+            competitors=[URLData(**doc) for doc in meta["competitors"]],
+            zone_means=zone_means,
+            items=items,
+            keywords=meta["keywords"],
+            keyword_embeds=keyword_embeds,
+            created_at=meta["created_at"],
+        )
+
+
+def build_profile(
+    competitors, keywords=(), zones=None, model=None, table=None, dedup=DEDUP_METHOD
+):
+    """Кодирует конкурентов один раз и собирает из них профиль выдачи"""
+    zones = list(zones or ZONES)
+    if table is None:
+        table = EmbeddingTable(model or get_model())
+    model = table.model
+
+    with metrics.stage("profile"):
+        table.prefetch(list(keywords) + collect_texts(competitors, zones, items=True))
+        profile = SerpProfile(
+            model_name=getattr(model, "cache_name", None),
+            zones=zones,
+            competitors=list(competitors),
+            keywords=list(keywords),
+            keyword_embeds=table.embed(keywords) if keywords else None,
+        )
+        for zone in zones:
+            comp_embeds = get_zone_embeddings(competitors, zone, model, table=table)
+            if comp_embeds is not None:
+                profile.zone_means[zone] = comp_embeds.mean(dim=0)
+            zone_items = competitor_item_groups(competitors, zone, table, dedup)
+            if zone_items is not None:
+                profile.items[zone] = zone_items
+    return profile
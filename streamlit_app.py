@@ -1,18 +1,36 @@
 import streamlit as st
 
-from core.main_page_utils import FAQ_TEXT, clean_input, display_results, run_analysis
+from core.ai_solver import LLM_MODE, LLM_MODES
+from core.main_page_utils import (
+    FAQ_TEXT,
+    LLM_MODE_LABELS,
+    clean_input,
+    show_job,
+    submit_job,
+)
+from core.pipline import warm_up
+
+# Модель и клиент LLM грузятся в фоне, пока пользователь заполняет форму
+warm_up(background=True)
 
 st.title("📊 TextMind 1.0")
 
 with st.expander("📘 Инструкция по использованию"):
     st.markdown(FAQ_TEXT)
 
+# Режим аудита меняет поля формы, поэтому переключается вне её
+site_audit = st.toggle("Аудит нескольких страниц")
+
 with st.form("analyze_form"):
     st.write("Настройки")
 
-    new_page = st.checkbox("Создать новую страницу")
+    new_page = False if site_audit else st.checkbox("Создать новую страницу")
 
-    my_domain = None if new_page else st.text_input("Моя страница")
+    my_domain = None if new_page or site_audit else st.text_input("Моя страница")
+    my_pages = (
+        st.text_area("Мои страницы (по одному на строку)") if site_audit else None
+    )
+    audit_llm = site_audit and st.checkbox("Рекомендации LLM для каждой страницы")
     competitors = st.text_area("Конкуренты (по одному на строку)")
     keywords = st.text_area("Ключевые слова (по одному на строку)")
 
@@ -38,29 +56,57 @@ with st.form("analyze_form"):
 
         struct = st.checkbox("Формировать структуру")
 
+        llm_mode = st.selectbox(
+            "Режим рекомендаций LLM",
+            LLM_MODES,
+            index=LLM_MODES.index(LLM_MODE),
+            format_func=LLM_MODE_LABELS.get,
+        )
+
+        no_llm_cache = st.checkbox("Не использовать кэш ответов LLM")
+
     submitted = st.form_submit_button("Анализировать")
 
-if submitted:
-    form_data = {
-        "my_domain": my_domain.strip() if my_domain else None,
-        "competitors": clean_input(competitors),
-        "keywords": clean_input(keywords),
-        "user_agent": user_agent.strip(),
-        "exclude_tags_list": clean_input(expose_tags),
-        "temperatura": temperatura,
-        "struct": struct,
-        "new_page": new_page,
-    }
-
-    with st.spinner("Анализ выполняется, подождите..."):
-        analysis = run_analysis(**form_data)
-
-    st.success("Анализ завершён ✅")
-
-    if analysis["new_page"]:
-        st.subheader("Итоговый анализ")
-        st.markdown(analysis["results"]["results"], unsafe_allow_html=True)
-    else:
-        display_results(
-            analysis["zone_relevance"], analysis["semantics_gaps"], analysis["results"]
-        )
+if submitted and site_audit and not clean_input(my_pages):
+    st.warning("Укажите хотя бы одну свою страницу")
+
+elif submitted and site_audit:
+    job = submit_job(
+        "audit",
+        {
+            "my_pages": clean_input(my_pages),
+            "competitors": clean_input(competitors),
+            "keywords": clean_input(keywords),
+            "user_agent": user_agent.strip(),
+            "exclude_tags_list": clean_input(expose_tags),
+            "temperatura": temperatura,
+            "struct": struct,
+            "with_llm": audit_llm,
+            "llm_mode": llm_mode,
+            "use_llm_cache": not no_llm_cache,
+        },
+    )
+    st.query_params["job"] = job.id
+
+elif submitted:
+    job = submit_job(
+        "analysis",
+        {
+            "my_domain": my_domain.strip() if my_domain else None,
+            "competitors": clean_input(competitors),
+            "keywords": clean_input(keywords),
+            "user_agent": user_agent.strip(),
+            "exclude_tags_list": clean_input(expose_tags),
+            "temperatura": temperatura,
+            "struct": struct,
+            "new_page": new_page,
+            "llm_mode": llm_mode,
+            "use_llm_cache": not no_llm_cache,
+        },
+    )
+    st.query_params["job"] = job.id
+
+# Анализ идёт в фоновой задаче; её ID в адресе страницы позволяет после
+# переподключения получить готовый результат, не запуская анализ заново
+if "job" in st.query_params:
+    show_job(st.query_params["job"])
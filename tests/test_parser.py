@@ -0,0 +1,112 @@
+"""
+Сравнение однопроходного извлечения зон (build_url_data) с прежним,
+которое обходило дерево отдельно для каждой зоны.
+
+legacy_build_url_data — копия прежнего извлечения: зоны должны совпадать с
+ним полностью, а плоский текст намеренно отличается (без дублей вложенных
+тегов и со словами, разделёнными пробелом на границах тегов).
+"""
+
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from core.parser import build_url_data, extract_url_path, target_tags
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "bench", "fixtures", "category_page.html"
+)
+URL = "https://example.com/catalog/divany-uglovye/"
+EXCLUDE_TAGS = ["script", "style", "noscript", "footer", "header", "nav"]
+ZONES = ["url_as_text", "title", "h1", "first_500_chars", "subheadings", "hrefs"]
+
+
+def legacy_build_url_data(url_str, row_html, exclude_tags_list):
+    soup = BeautifulSoup(row_html, "html.parser")
+    for tag in soup(exclude_tags_list):
+        tag.extract()
+
+    data = {"url": url_str, "url_as_text": extract_url_path(url_str)}
+    title_tag = soup.title
+    data["title"] = title_tag.get_text(strip=True) if title_tag else None
+    h1_tag = soup.find("h1")
+    data["h1"] = h1_tag.get_text(strip=True) if h1_tag else None
+    data["first_500_chars"] = None
+    if h1_tag is not None:
+        text_after_h1 = "".join(h1_tag.find_all_next(string=True))
+        if text_after_h1:
+            data["first_500_chars"] = text_after_h1.strip()[:500]
+
+    data["subheadings"] = [
+        el.get_text(strip=True)
+        for lvl in ["h2", "h3", "h4", "h5", "h6"]
+        for el in soup.find_all(lvl)
+        if el.get_text(strip=True)
+    ]
+    hrefs = [
+        a.get_text(strip=True)
+        for a in soup.find_all("a", href=True)
+        if a.get_text(strip=True)
+    ]
+    data["hrefs"] = hrefs or None
+
+    text_parts = [
+        element.get_text(strip=True)
+        for tag in target_tags
+        for element in soup.find_all(tag)
+        if element.get_text(strip=True)
+    ]
+    data["text"] = " ".join(text_parts)
+    data["word_count"] = len(data["text"].split())
+
+    structures = []
+    for table in soup.find_all("table"):
+        for tr in table.find_all("tr"):
+            cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
+            if cells:
+                structures.append(" ".join(cells))
+    for ul in soup.find_all(["ul", "ol"]):
+        for li in ul.find_all("li"):
+            txt = li.get_text(strip=True)
+            if txt:
+                structures.append(txt)
+    data["structures"] = structures or None
+    return data
+
+
+@pytest.fixture(scope="module")
+def fixture_html():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("exclude", [EXCLUDE_TAGS, ["script", "style"]])
+def test_zones_match_legacy_extractor(fixture_html, exclude):
+    old = legacy_build_url_data(URL, fixture_html, exclude)
+    new = build_url_data(URL, fixture_html, exclude)
+    for zone in ZONES + ["structures"]:
+        assert getattr(new, zone) == old[zone], zone
+
+
+def test_text_without_nested_duplicates(fixture_html):
+    old = legacy_build_url_data(URL, fixture_html, EXCLUDE_TAGS)
+    new = build_url_data(URL, fixture_html, EXCLUDE_TAGS)
+    # Прежний текст повторял каждый абзац во всех обёртках div/section/main
+    assert (old["word_count"], new.word_count) == (565, 144)
+    assert new.word_count == len(new.text.split())
+
+
+def test_nested_wrappers_counted_once():
+    html = "<main><section><div><p>Один два три</p></div></section></main>"
+    old = legacy_build_url_data("u", html, [])
+    new = build_url_data("u", html, [])
+    assert old["text"] == " ".join(["Один два три"] * 4)
+    assert new.text == "Один два три"
+    assert new.word_count == 3
+
+
+def test_inline_tags_separate_words():
+    html = "<p>Hello <b>world</b>!</p>"
+    assert legacy_build_url_data("u", html, [])["text"] == "Helloworld!"
+    assert build_url_data("u", html, []).text == "Hello world !"